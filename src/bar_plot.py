@@ -1,9 +1,10 @@
 import os
-import re
 import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import inventory
+import batch_plot
 
 def input_parse():
     # Define argparse to get input, output paths
@@ -15,6 +16,19 @@ def input_parse():
     parser.add_argument("-a",
                         "--alphabetical",
                         action="store_true")
+    parser.add_argument("-c",
+                        "--convention",
+                        choices=inventory.conventions(),
+                        default="bars",
+                        help="Transcription convention, the graph lists in data/inventories, by default the ‖j‖ vowels this script has always used")
+    parser.add_argument("--batch",
+                        action="store_true",
+                        help="Save the plots without showing them, rendering them in parallel")
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        default=1,
+                        help="Number of processes rendering the plots with --batch")
     args = parser.parse_args()
     
     return args
@@ -33,35 +47,18 @@ def load_data(filename):
 
     return df
 
-def process_vowels(df):
+def process_vowels(df, convention="bars"):
 
     # Initialize a dictionary to store vowel combinations and their frequencies
     vowel_combinations = {}
 
-    vowels = ["a","ä","â","à","á","å",
-            "e","ë","ê","è","é",
-            "i","ï","î","ì","í",
-            "o","ö","ô","ø","ò","ó",
-            "u","ü","û","ù","ú","ů",
-            "y","ÿ","ŷ","ỳ","ý",
-            "æ","œ","œ̂","œ̀","œ́",
-            "‖j‖","‖j̈‖","‖ĵ‖","‖j́‖",
-            "‖v‖","‖v̈‖","‖v̂‖","‖v̀‖","‖v́‖","‖v̊‖",
-            "‖w‖","‖ẅ‖","‖ŵ‖","‖ẁ‖","‖ẃ‖","‖ẘ‖",
-            "(i)","(ï)","(î)","(ì)","(í)",
-            "(y)","(ÿ)","(ŷ)","(ỳ)","(ý)",
-            "(j)","(j̈)","(ĵ)","(j́)",
-            "(u)","(ü)","(û)","(ù)","(ú)","(ů)",
-            "(v)","(v̈)","(v̂)","(v̀)","(v́)","(v̊)",
-            "(w)","(ẅ)","(ŵ)","(ẁ)","(ẃ)","(ẘ)"]
-
-    # Define a regex pattern to match consecutive vowels
-    vowel_pattern = r"([" + "".join(map(re.escape, vowels)) + r"]{2,})"
-    vowel_regex = re.compile(vowel_pattern)
+    # the vowels of the transcription convention, and a pattern for two or more of them in a row
+    vowels = inventory.convention(convention)["vowels"]
+    vowel_regex = vowels.sequence_pattern(2)
 
     # Iterate through each row in the dataframe
     for index, row in df.iterrows():
-        word = row["Token"]
+        word = inventory.normalize(row["Token"])
         frequency = row["Frequency"]
         
         # Exclude words that begin with '*' or '!'
@@ -82,8 +79,8 @@ def process_vowels(df):
                 else:
                     vowel_combinations[vowel_sequence] = frequency
         
-        # Filter out non-vowel characters and count individual vowels
-        for i, char in enumerate(filter(lambda c: c in vowels, word)):
+        # Filter out non-vowel graphs and count individual vowels
+        for i, char in enumerate(vowels.tokens(word)):
             # If the current character is not part of a consecutive vowel sequence
             if not consecutive_vowels_found:
                 if char in vowel_combinations:
@@ -115,7 +112,12 @@ def process_vowels(df):
     return vowel_combinations
 
 # Function to plot bar plots
-def plot_bar(data, title, outfile):
+def plot_bar(data, title, outfile, plots=None):
+    outpath = os.path.join("output", "graphs", outfile)
+    if plots is not None:
+        # batch mode, collect the plot for batch_plot to render
+        plots.append(batch_plot.bar_job(data, 'Vowel', title, outpath))
+        return
     plt.figure(figsize=(10, 6))
     plt.bar(data['Vowel'], data['Count'], color='skyblue')
     plt.xlabel('Vowel')
@@ -123,11 +125,11 @@ def plot_bar(data, title, outfile):
     plt.title(title)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    outpath = os.path.join("output", "graphs", outfile)
     plt.savefig(outpath)
     plt.show()
+    plt.close()
 
-def plot_results(vowel_combinations, args):
+def plot_results(vowel_combinations, args, plots=None):
 
     # Convert the dictionary to a DataFrame for plotting
     df_plot = pd.DataFrame(vowel_combinations.items(), columns=['Vowel', 'Count'])
@@ -145,7 +147,7 @@ def plot_results(vowel_combinations, args):
         df_plot = df_plot.sort_values(by='Count', 
                                         ascending=False)
 
-    plot_bar(df_plot, "Vowel counts", "vowel_counts_bar_plot.png")
+    plot_bar(df_plot, "Vowel counts", "vowel_counts_bar_plot.png", plots=plots)
 
     # Separate vowel sequences into monographs, digraphs, and trigraphs
     monographs = []
@@ -172,7 +174,7 @@ def plot_results(vowel_combinations, args):
         df_monographs = pd.DataFrame(monographs_data.items(), 
                                     columns=['Vowel', 'Count']).sort_values(by='Count', 
                                                                             ascending=False)
-    plot_bar(df_monographs, 'Count of Monographs', 'monographs_bar_plot.png')
+    plot_bar(df_monographs, 'Count of Monographs', 'monographs_bar_plot.png', plots=plots)
 
     # Plot digraphs
     digraphs_data = {key: vowel_combinations[key] for key in digraphs}
@@ -184,7 +186,7 @@ def plot_results(vowel_combinations, args):
         df_digraphs = pd.DataFrame(digraphs_data.items(), 
                         columns=['Vowel', 'Count']).sort_values(by='Count', 
                                                                 ascending=False)
-    plot_bar(df_digraphs, 'Count of Digraphs', 'digraphs_bar_plot.png')
+    plot_bar(df_digraphs, 'Count of Digraphs', 'digraphs_bar_plot.png', plots=plots)
 
     # Plot trigraphs
     trigraphs_data = {key: vowel_combinations[key] for key in trigraphs}
@@ -196,7 +198,7 @@ def plot_results(vowel_combinations, args):
         df_trigraphs = pd.DataFrame(trigraphs_data.items(), 
                             columns=['Vowel', 'Count']).sort_values(by='Count', 
                                                                     ascending=False)
-    plot_bar(df_trigraphs, 'Count of Trigraphs', 'trigraphs_bar_plot.png')
+    plot_bar(df_trigraphs, 'Count of Trigraphs', 'trigraphs_bar_plot.png', plots=plots)
 
     #plot tetragraphs
     tetragraphs_data = {key: vowel_combinations[key] for key in tetragraphs}
@@ -208,7 +210,7 @@ def plot_results(vowel_combinations, args):
         df_tetragraphs = pd.DataFrame(tetragraphs_data.items(), 
                                     columns = ["Vowel","Count"]).sort_values(by="Count", 
                                                                             ascending=False)
-    plot_bar(df_tetragraphs, "Count of Tetragraphs", "tetragraphs_bar_plot.png")
+    plot_bar(df_tetragraphs, "Count of Tetragraphs", "tetragraphs_bar_plot.png", plots=plots)
 
     return None
 
@@ -276,9 +278,15 @@ def main():
     # load data
     df = load_data(args.filename)
     # process all the vowel combos
-    vowel_combinations = process_vowels(df)
+    vowel_combinations = process_vowels(df, args.convention)
     # save visualizations
-    plot_results(vowel_combinations, args)
+    if args.batch:
+        batch_plot.headless()
+        plots = []
+        plot_results(vowel_combinations, args, plots=plots)
+        batch_plot.render(plots, args.workers)
+    else:
+        plot_results(vowel_combinations, args)
     # save output tables
     save_tables(vowel_combinations, args)
 
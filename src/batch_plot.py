@@ -0,0 +1,41 @@
+import multiprocessing
+import matplotlib
+from matplotlib.figure import Figure
+
+def headless():
+    # non-interactive backend, so nothing opens a window or waits for one to close
+    matplotlib.use("Agg")
+
+def bar_job(data, column, title, outpath):
+    # everything render_bar needs, small enough to send to another process
+    return (data[column].tolist(), data['Count'].tolist(), column, title, outpath)
+
+def render_bar(job):
+    """
+    draw one bar plot, as plot_bar in the plotting scripts does, on a figure
+    of its own that is not registered with pyplot, so it is freed as soon as
+    it is saved
+    """
+    labels, counts, column, title, outpath = job
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.bar(labels, counts, color='skyblue')
+    ax.set_xlabel(column)
+    ax.set_ylabel('Count')
+    ax.set_title(title)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    fig.savefig(outpath)
+
+    return outpath
+
+def pool_map(func, items, workers=1):
+    # func over the items in a process pool, or in this process for a single worker
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with multiprocessing.Pool(min(workers, len(items))) as pool:
+        return pool.map(func, items, chunksize=1)
+
+def render(jobs, workers=1):
+    # all the bar plots collected by plot_results, rendered concurrently
+    return pool_map(render_bar, jobs, workers)
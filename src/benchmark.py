@@ -0,0 +1,164 @@
+import os
+import sys
+import time
+import tempfile
+import argparse
+from collections import Counter
+import pandas as pd
+import wordlist_extract
+import word_parser
+import sound_position
+import leading_graph
+import graph_counts
+import batch_plot
+import vowels_plot
+import consonants_plot
+import matplotlib.pyplot as plt
+# the original code and the synthetic inputs are shared with the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests"))
+from legacy import legacy_wordlist, legacy_parse, legacy_export, legacy_cluster, legacy_counts, legacy_plot_bar, legacy_transform
+from samples import synthetic_text, synthetic_segmented, synthetic_annotated, synthetic_box, synthetic_wordlist
+
+def input_parse():
+    # Define argparse to pick the stage and the size of the synthetic input
+    parser = argparse.ArgumentParser(description="Times the optimised pipeline stages against the original code, the results are compared in the tests.")
+    parser.add_argument("-s",
+                        "--stage",
+                        choices=["wordlist", "parse", "export", "workers", "cluster", "leading", "counts", "plots"],
+                        default="wordlist",
+                        help="Which stage to benchmark")
+    parser.add_argument("-n",
+                        "--size",
+                        type=int,
+                        default=200000,
+                        help="Number of words in the synthetic input")
+    parser.add_argument("-r",
+                        "--repeat",
+                        type=int,
+                        default=3,
+                        help="Number of timed runs, the best one is reported")
+    args = parser.parse_args()
+
+    return args
+
+def new_wordlist(raw_text):
+    regexed_text = wordlist_extract.ugly_regex(raw_text)
+
+    return wordlist_extract.sort_counts(wordlist_extract.count_tokens(regexed_text, Counter()))
+
+# the original word_parser export, kept here as the reference
+def compare_export(size, repeat):
+    # both exports of the same parsed wordlist
+    words = synthetic_segmented(size)
+    df = pd.DataFrame({"Token": words, "Frequency": range(size)})
+    parsed = word_parser.ParsedGraphs.from_lists([word_parser.parse(word) for word in words])
+    with tempfile.TemporaryDirectory() as tmp:
+        compare_times("export", lambda p: legacy_export(df, parsed, os.path.join(tmp, "legacy.xlsx")),
+                      lambda p: word_parser.export_rows(df, parsed, os.path.join(tmp, "new.xlsx")), parsed, repeat)
+
+def compare_workers(size, repeat):
+    # the parallel parse against the serial one for growing pools
+    words = synthetic_segmented(size)
+    serial_time, _ = best_time(lambda w: word_parser.ParsedGraphs.from_lists([word_parser.parse(x) for x in w]), words, repeat)
+    print(f"[INFO]: workers: serial {serial_time:.3f}s ({os.cpu_count()} cpus available)")
+    workers = 2
+    while workers <= max(2 * os.cpu_count(), 4):
+        parallel_time, _ = best_time(lambda w: word_parser.parse_parallel(w, workers), words, repeat)
+        print(f"[INFO]: workers: {workers} workers {parallel_time:.3f}s, speedup {serial_time / parallel_time:.1f}x")
+        workers *= 2
+
+def new_cluster(df):
+    return sound_position.cluster_positions(df).sort_values(by='sound_position')
+
+def compare_cluster(size, repeat):
+    compare_times("cluster", legacy_cluster, new_cluster, synthetic_annotated(size), repeat)
+
+def compare_leading(size, repeat):
+    df, columns = synthetic_box(size)
+    compare_times("leading", lambda d: legacy_transform(d, columns), lambda d: leading_graph.transform_data(d, columns), df, repeat)
+
+def single_pass_counts(df):
+    return tuple(map(graph_counts.merge_counts, graph_counts.count_graphs(df)))
+
+def compare_counts(size, repeat):
+    # the original loops and the single pass
+    compare_times("counts", legacy_counts, single_pass_counts, synthetic_wordlist(size), repeat)
+
+DOCUMENTS = 50
+
+def plot_jobs(tables, outdir):
+    # the bar plots of every document, as graphs_plot.py collects them
+    args = argparse.Namespace(alphabetical=False)
+    plots = []
+    for i, (vowel_combinations, consonant_combinations) in enumerate(tables):
+        vowels_plot.plot_results(vowel_combinations, args, prefix=f"doc{i}_vowel_", plots=plots)
+        consonants_plot.plot_results(consonant_combinations, args, prefix=f"doc{i}_consonant_", plots=plots)
+
+    return [job[:-1] + (os.path.join(outdir, os.path.basename(job[-1])),) for job in plots]
+
+def compare_plots(size, repeat):
+    # a run over DOCUMENTS wordlists: the original loops and open pyplot figures, then the batch mode
+    batch_plot.headless()
+    wordlists = [synthetic_wordlist(size // DOCUMENTS, seed=i) for i in range(DOCUMENTS)]
+    workers = os.cpu_count()
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_dir = os.path.join(tmp, "legacy")
+        new_dir = os.path.join(tmp, "new")
+        os.makedirs(legacy_dir)
+        os.makedirs(new_dir)
+
+        def legacy_run(wordlists):
+            jobs = plot_jobs([legacy_counts(df) for df in wordlists], legacy_dir)
+            for job in jobs:
+                legacy_plot_bar(job)
+            plt.close("all")
+            return jobs
+
+        def new_run(wordlists):
+            jobs = plot_jobs(batch_plot.pool_map(single_pass_counts, wordlists, workers), new_dir)
+            batch_plot.render(jobs, workers)
+            return jobs
+
+        legacy_time, jobs = best_time(legacy_run, wordlists, repeat)
+        new_time, _ = best_time(new_run, wordlists, repeat)
+    print(f"[INFO]: plots: {DOCUMENTS} wordlists, {len(jobs)} plots, original {legacy_time:.3f}s, batch with {workers} workers {new_time:.3f}s, speedup {legacy_time / new_time:.1f}x")
+
+def best_time(func, data, repeat):
+    # best of several runs, together with the result of the last one
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), result
+
+def compare_times(name, legacy, new, data, repeat):
+    # timing only, the results are compared in the tests
+    legacy_time, _ = best_time(legacy, data, repeat)
+    new_time, _ = best_time(new, data, repeat)
+    print(f"[INFO]: {name}: original {legacy_time:.3f}s, optimised {new_time:.3f}s, speedup {legacy_time / new_time:.1f}x")
+
+def main():
+    args = input_parse()
+    if args.stage == "wordlist":
+        raw_text = synthetic_text(args.size)
+        compare_times("wordlist", legacy_wordlist, new_wordlist, raw_text, args.repeat)
+    elif args.stage == "parse":
+        words = synthetic_segmented(args.size)
+        compare_times("parse", lambda w: [legacy_parse(x) for x in w], lambda w: [word_parser.parse(x) for x in w], words, args.repeat)
+    elif args.stage == "export":
+        compare_export(args.size, args.repeat)
+    elif args.stage == "workers":
+        compare_workers(args.size, args.repeat)
+    elif args.stage == "cluster":
+        compare_cluster(args.size, args.repeat)
+    elif args.stage == "leading":
+        compare_leading(args.size, args.repeat)
+    elif args.stage == "counts":
+        compare_counts(args.size, args.repeat)
+    elif args.stage == "plots":
+        compare_plots(args.size, args.repeat)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,281 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import graphematic
+
+def input_parse():
+    # Define argparse to get the boxes and what to do with them
+    parser = argparse.ArgumentParser(description="Clusters boxes, or manuscripts, by their graphemic distance and finds the nearest boxes.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-f",
+                        "--files",
+                        nargs='+',
+                        help='Boxes in data/6_boxes')
+    source.add_argument("-d",
+                        "--directory",
+                        help='Every box in this folder of data/6_boxes (use . for all of them)')
+    parser.add_argument("--metric",
+                        choices=list(graphematic.METRICS),
+                        default="l1",
+                        help='Distance between two boxes')
+    parser.add_argument("-l",
+                        "--level",
+                        choices=["box", "manuscript"],
+                        default="box",
+                        help='Cluster the boxes, or the manuscripts (the folders the boxes are in)')
+    parser.add_argument("--linkage",
+                        choices=list(LINKAGES),
+                        default="average",
+                        help='Distance between two clusters')
+    parser.add_argument("-k",
+                        "--clusters",
+                        type=int,
+                        default=0,
+                        help='Also cut the tree into this many clusters')
+    parser.add_argument("-n",
+                        "--neighbours",
+                        type=int,
+                        default=5,
+                        help='Number of nearest neighbours to list for every box')
+    parser.add_argument("-q",
+                        "--query",
+                        help='Only print the nearest neighbours of this box')
+    parser.add_argument("-o",
+                        "--outfile",
+                        default="clusters",
+                        help='Name of the output files, without extension')
+    parser.add_argument("--no_cache",
+                        action='store_true',
+                        help='Read every box from its Excel file instead of the box vector cache')
+    args = parser.parse_args()
+
+    # the boxes, and what is clustered: the boxes or their manuscripts
+    args.input_names = args.files if args.files is not None else graphematic.list_boxes(args.directory)
+    labels = args.input_names
+    if args.level == "manuscript":
+        labels = list(dict.fromkeys(split_name(box)[0] for box in args.input_names))
+    items = "boxes" if args.level == "box" else "manuscripts"
+    if len(labels) < 2:
+        parser.error(f"clustering needs at least 2 {items}, {len(labels)} given")
+    if args.query is not None and args.query not in labels:
+        parser.error(f"--query {args.query} is not one of the {len(labels)} {items} given")
+
+    return args
+
+# Lance-Williams updates: the distance of every cluster k to the union of
+# clusters i and j, from d(i, k), d(j, k), d(i, j) and the cluster sizes
+def single(d_i, d_j, d_ij, n_i, n_j, n_k):
+    return np.minimum(d_i, d_j)
+
+def complete(d_i, d_j, d_ij, n_i, n_j, n_k):
+    return np.maximum(d_i, d_j)
+
+def average(d_i, d_j, d_ij, n_i, n_j, n_k):
+    return (n_i * d_i + n_j * d_j) / (n_i + n_j)
+
+def ward(d_i, d_j, d_ij, n_i, n_j, n_k):
+    return np.sqrt(np.maximum(((n_i + n_k) * d_i ** 2 + (n_j + n_k) * d_j ** 2 - n_k * d_ij ** 2) / (n_i + n_j + n_k), 0))
+
+LINKAGES = {"average": average, "complete": complete, "single": single, "ward": ward}
+
+def linkage(distances, method="average"):
+    """
+    agglomerative clustering of a square distance matrix, as a linkage
+    matrix in the layout scipy uses: one row (cluster, cluster, distance,
+    size) per merge, where clusters n, n+1, ... are the merges so far.
+    Merges are found with the nearest-neighbour chain, so every step is one
+    argmin over a row and every merge one update of a row.
+    """
+    update = LINKAGES[method]
+    n = len(distances)
+    if n < 2:
+        raise ValueError("clustering needs a distance matrix of at least 2 items")
+    d = np.array(distances, dtype=float)
+    np.fill_diagonal(d, np.inf)
+    size = np.ones(n)
+    active = np.ones(n, dtype=bool)
+    merges = []
+    chain = []
+    while len(merges) < n - 1:
+        if not chain:
+            chain.append(int(np.flatnonzero(active)[0]))
+        while True:
+            x = chain[-1]
+            y = int(np.argmin(d[x]))
+            # keep to the chain on ties, so it always ends in a reciprocal pair
+            if len(chain) > 1 and d[x, chain[-2]] <= d[x, y]:
+                y = chain[-2]
+            if len(chain) > 1 and y == chain[-2]:
+                break
+            chain.append(y)
+        chain = chain[:-2]
+        if x > y:
+            x, y = y, x
+        merges.append((x, y, d[x, y], size[x] + size[y]))
+
+        # the merged cluster takes the place of y, x is left out from now on
+        row = update(d[x], d[y], d[x, y], size[x], size[y], size)
+        active[x] = False
+        row[~active] = np.inf
+        row[y] = np.inf
+        d[y, :] = row
+        d[:, y] = row
+        d[x, :] = np.inf
+        d[:, x] = np.inf
+        size[y] += size[x]
+
+    return relabel(merges, n)
+
+def relabel(merges, n):
+    # sort the merges by distance and number the clusters in that order
+    merges = sorted(merges, key=lambda merge: merge[2])
+    parent = np.arange(n)
+    label = np.arange(n)
+    tree = np.zeros((len(merges), 4))
+    for step, (x, y, distance, size) in enumerate(merges):
+        a, b = find(parent, x), find(parent, y)
+        first, second = sorted([label[a], label[b]])
+        tree[step] = (first, second, distance, size)
+        parent[b] = a
+        label[a] = n + step
+
+    return tree
+
+def find(parent, i):
+    # root of i in a union-find forest, halving the path on the way
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+
+    return i
+
+def flat_clusters(tree, n, k):
+    # cluster number (from 1) of every leaf when the tree is cut into k clusters
+    parent = np.arange(2 * n - 1)
+    for step, (a, b, distance, size) in enumerate(tree[:max(n - k, 0)]):
+        parent[int(a)] = parent[int(b)] = n + step
+    roots = np.array([find(parent, i) for i in range(n)])
+
+    return pd.factorize(roots)[0] + 1
+
+def leaf_order(tree, n):
+    # leaves from left to right in the dendrogram
+    order = []
+    stack = [2 * n - 2]
+    while stack:
+        node = stack.pop()
+        if node < n:
+            order.append(node)
+        else:
+            a, b = tree[node - n, :2].astype(int)
+            stack.extend([b, a])
+
+    return order
+
+def plot_dendrogram(tree, labels, outpath, title):
+    # draw the tree with one vertical line per cluster and a bar for every merge
+    n = len(labels)
+    order = leaf_order(tree, n)
+    x = np.zeros(2 * n - 1)
+    x[order] = np.arange(n)
+    height = np.zeros(2 * n - 1)
+    plt.figure(figsize=(max(10, n * 0.25), 6))
+    for step, (a, b, distance, size) in enumerate(tree):
+        a, b = int(a), int(b)
+        plt.plot([x[a], x[a], x[b], x[b]], [height[a], distance, distance, height[b]], color="tab:blue", linewidth=1)
+        x[n + step] = (x[a] + x[b]) / 2
+        height[n + step] = distance
+    plt.xticks(np.arange(n), [labels[i] for i in order], rotation=90, fontsize=8)
+    plt.ylabel("Distance")
+    plt.title(title)
+    plt.tight_layout()
+    plt.savefig(outpath)
+    plt.close()
+
+def nearest(distances, k):
+    """
+    the k nearest other items of every item, as arrays of indices and
+    distances (items, k), nearest first
+    """
+    d = np.array(distances, dtype=float)
+    np.fill_diagonal(d, np.inf)
+    k = min(k, len(d) - 1)
+    if k <= 0:
+        return np.zeros((len(d), 0), dtype=int), np.zeros((len(d), 0))
+    candidates = np.argpartition(d, k - 1, axis=1)[:, :k]
+    candidate_distances = np.take_along_axis(d, candidates, axis=1)
+    order = np.argsort(candidate_distances, axis=1, kind="stable")
+
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_distances, order, axis=1)
+
+def split_name(box):
+    # manuscript (the first folder) and box name of a box path
+    parts = os.path.normpath(box).split(os.sep)
+
+    return (parts[0], os.path.join(*parts[1:])) if len(parts) > 1 else (".", parts[0])
+
+def manuscript_distances(input_names, distances):
+    """
+    distance between every two manuscripts: the mean distance between their
+    boxes of the same name. Manuscripts without a box in common get the
+    largest distance found.
+    """
+    manuscripts, boxes = zip(*map(split_name, input_names))
+    manuscript_ids, manuscript_names = pd.factorize(pd.Series(manuscripts))
+    box_ids = pd.factorize(pd.Series(boxes))[0]
+    m = len(manuscript_names)
+    totals = np.zeros((m, m))
+    counts = np.zeros((m, m))
+    for box in np.unique(box_ids):
+        members = np.flatnonzero(box_ids == box)
+        rows = manuscript_ids[members]
+        np.add.at(totals, (rows[:, None], rows[None, :]), distances[np.ix_(members, members)])
+        np.add.at(counts, (rows[:, None], rows[None, :]), 1)
+    result = np.divide(totals, counts, out=np.full((m, m), np.nan), where=counts > 0)
+    np.fill_diagonal(result, 0)
+    fill = np.nanmax(result) if np.isfinite(result).any() else 0
+
+    return list(manuscript_names), np.where(np.isnan(result), fill, result)
+
+def main():
+    args = input_parse()
+    input_names = args.input_names
+    store = None if args.no_cache else graphematic.BoxStore()
+
+    # all distances at once, from the box vector cache
+    graphemes, matrix = graphematic.box_matrix(input_names, store)
+    distances = graphematic.pairwise_distances(matrix, args.metric)
+    labels = list(input_names)
+    if args.level == "manuscript":
+        labels, distances = manuscript_distances(input_names, distances)
+
+    neighbours, neighbour_distances = nearest(distances, args.neighbours)
+    if args.query is not None:
+        i = labels.index(args.query)
+        for j, distance in zip(neighbours[i], neighbour_distances[i]):
+            print(f"{labels[j]:<50}  {distance:.6f}")
+        print(f"\n[INFO]: The {len(neighbours[i])} nearest to {args.query} ({args.metric})\n")
+        return
+
+    tree = linkage(distances, args.linkage)
+    outpath = os.path.join("output", "distance", args.outfile + ".xlsx")
+    with pd.ExcelWriter(outpath) as writer:
+        pd.DataFrame(tree, columns=["cluster_1", "cluster_2", "distance", "size"]).astype({"cluster_1": int, "cluster_2": int, "size": int}).to_excel(writer, sheet_name="linkage", index=False)
+        if args.clusters:
+            pd.DataFrame({args.level: labels, "cluster": flat_clusters(tree, len(labels), args.clusters)}).to_excel(writer, sheet_name="clusters", index=False)
+        table = {args.level: labels}
+        for rank in range(neighbours.shape[1]):
+            table[f"neighbour_{rank + 1}"] = [labels[j] for j in neighbours[:, rank]]
+            table[f"distance_{rank + 1}"] = neighbour_distances[:, rank]
+        pd.DataFrame(table).to_excel(writer, sheet_name="neighbours", index=False)
+    np.savez(os.path.join("output", "distance", args.outfile + ".npz"), labels=np.array(labels, dtype=str),
+             condensed=graphematic.condensed(distances), linkage=tree)
+
+    plotpath = os.path.join("output", "graphs", args.outfile + ".png")
+    plot_dendrogram(tree, labels, plotpath, f"{args.linkage.capitalize()} linkage of {args.level}s, {args.metric} distance")
+    print(f"\n[INFO]: Clusters of {len(labels)} {'boxes' if args.level == 'box' else 'manuscripts'} have been saved to {outpath}, the dendrogram to {plotpath}\n")
+
+if __name__ == "__main__":
+    main()
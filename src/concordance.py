@@ -0,0 +1,79 @@
+import os
+import argparse
+import numpy as np
+
+def input_parse():
+    # Define argparse to get the index and the query
+    parser = argparse.ArgumentParser(description="Shows every occurrence of a token or graph in its context, using the index saved by wordlist_extract.py --index")
+    parser.add_argument("-f",
+                        "--filename",
+                        required=True,
+                        help="Name of the transcription the index was built from")
+    parser.add_argument("-q",
+                        "--query",
+                        required=True,
+                        help="Token to look up")
+    parser.add_argument("-g",
+                        "--graph",
+                        action="store_true",
+                        help="Match every token containing the query instead of the exact token")
+    parser.add_argument("-w",
+                        "--width",
+                        type=int,
+                        default=5,
+                        help="Number of tokens of context on each side")
+    args = parser.parse_args()
+
+    return args
+
+def load_index(filename):
+    # read the index of a transcription into memory
+    inpath = os.path.join("data", "1_wordlists", "index", filename.split(".")[0]+".npz")
+    with np.load(inpath) as data:
+        index = {key: data[key] for key in data.files}
+
+    return index
+
+def lookup(index, query, graph=False):
+    """
+    positions in the text of a token, or of every token containing the
+    query as a graph, in text order
+    """
+    vocab = index["vocab"]
+    if graph:
+        ids = np.flatnonzero(np.char.find(vocab, query) >= 0)
+    else:
+        ids = np.flatnonzero(vocab == query)
+    offsets = index["offsets"]
+    positions = [index["positions"][offsets[i]:offsets[i+1]] for i in ids]
+    if not positions:
+        return np.array([], dtype=np.int32)
+
+    return np.sort(np.concatenate(positions))
+
+def concordance(index, query, graph=False, width=5):
+    """
+    keyword in context lines for a query, as tuples of
+    (paragraph, left context, token, right context)
+    """
+    vocab = index["vocab"]
+    tokens = index["tokens"]
+    lines = []
+    for position in lookup(index, query, graph):
+        left = " ".join(vocab[tokens[max(position - width, 0):position]])
+        right = " ".join(vocab[tokens[position + 1:position + 1 + width]])
+        lines.append((int(index["paragraphs"][position]), left, str(vocab[tokens[position]]), right))
+
+    return lines
+
+def main():
+    args = input_parse()
+    index = load_index(args.filename)
+    lines = concordance(index, args.query, args.graph, args.width)
+    for paragraph, left, token, right in lines:
+        print(f"{paragraph:>6}  {left:>50}  {token}  {right}")
+
+    print(f"\n[INFO]: {len(lines)} occurrences of {args.query} in {args.filename}\n")
+
+if __name__=="__main__":
+    main()
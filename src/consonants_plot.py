@@ -1,10 +1,11 @@
 import os
-import re
 import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from collections import defaultdict
+import graph_counts
+import inventory
+import batch_plot
 
 def input_parse():
     # Define argparse to get input, output paths
@@ -16,95 +17,34 @@ def input_parse():
     parser.add_argument("-a",
                         "--alphabetical",
                         action="store_true")
+    parser.add_argument("-c",
+                        "--convention",
+                        choices=inventory.conventions(),
+                        default="default",
+                        help="Transcription convention, the graph lists in data/inventories")
+    parser.add_argument("--batch",
+                        action="store_true",
+                        help="Save the plots without showing them, rendering them in parallel")
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        default=1,
+                        help="Number of processes rendering the plots with --batch")
     args = parser.parse_args()
     
     return args
 
-def load_data(filename):
-    # Read the Excel file
-    filepath = os.path.join("data", "2_segmented_wordlists", filename)
-    df = pd.read_excel(filepath)
-
-    # Assuming your column name is 'Token', and 'Frequency' for the frequency column
-    column_name = 'Token'
-    frequency_column = 'Frequency'
-
-    # Lowercase the words in the column and convert to string type
-    df[column_name] = df[column_name].astype(str).str.lower()
-    #df.dropna(inplace=True)
-
-    return df
-
-def process_consonants(df):
-
-    # Initialize a dictionary to store consonant combinations and their frequencies
-    consonant_combinations = {}
-
-    consonants = ["b", "c", "d", "f", 
-                  "g", "h", "j", "k",
-                  "l", "m" , "n", "p" , 
-                  "q", "r", "s", "ß" , "ſ" , 
-                  "t", "v", "w", "x" , "z" , 
-                  "þ", "ð", 
-                  "‖i‖", "‖y‖", "‖u‖", "‖ï‖" , 
-                  "‖î‖", "‖ì‖", "‖í‖", "‖ÿ‖", 
-                  "‖ŷ‖", "‖ỳ‖", "‖ý‖", "‖ü‖" , 
-                  "‖û‖", "‖ù‖", "‖ú‖", "‖ů‖"]
-
-    # Define a regex pattern to match consecutive consonants
-    # Escape special characters
-    escaped_consonants = [re.escape(v) for v in consonants]
-
-    # Join the list into a single regex pattern with alternation
-    pattern = "|".join(escaped_consonants)
-
-    # Compile the regex pattern
-    compiled_pattern = re.compile(pattern)
-
-    # Iterate through each row in the dataframe
-    for index, row in df.iterrows():
-        word = row["Token"].lower()
-        frequency = row["Frequency"]
-        
-        # Exclude words that begin with '*' or '!'
-        cleaned = re.sub('\*.*?\*', '', word)
-        cleaned = re.sub('\!.*?\!', '', cleaned)
-        
-        if cleaned=="nan":
-            pass    
-        else:
-            clusters = re.findall(r'\:(.*?)\:', cleaned)
-            if clusters:
-                for consonant_sequence in clusters:
-                    if consonant_sequence in consonant_combinations:
-                        consonant_combinations[consonant_sequence] += frequency
-                    else:
-                        consonant_combinations[consonant_sequence] = frequency
-            else:
-                consonants = re.findall(pattern, cleaned)
-                for consonant in consonants:
-                    if consonant in consonant_combinations:
-                        consonant_combinations[consonant] += frequency
-                    else:
-                        consonant_combinations[consonant] = frequency
-
-    return consonant_combinations
-
-def normalize_key(key):
-    # Remove punctuation using regex
-    return re.sub(r'[^\w\s]', '', key)
-
-def merge_dict_values(d):
-    merged_dict = defaultdict(int)
-    
-    for key, value in d.items():
-        normalized_key = normalize_key(key)
-        merged_dict[normalized_key] += value
-    
-    return dict(merged_dict)
+def process_consonants(df, convention="default"):
+    # consonant combinations and their frequencies, merged over punctuation, from the shared counting engine
+    return graph_counts.merge_counts(graph_counts.count_graphs(df, convention, ["consonants"])[0])
 
 # Function to plot bar plots
-def plot_bar(data, title, outfile):
+def plot_bar(data, title, outfile, plots=None):
+    outpath = os.path.join("output", "graphs", outfile)
+    if plots is not None:
+        # batch mode, collect the plot for batch_plot to render
+        plots.append(batch_plot.bar_job(data, 'consonant', title, outpath))
+        return
     plt.figure(figsize=(10, 6))
     plt.bar(data['consonant'], data['Count'], color='skyblue')
     plt.xlabel('consonant')
@@ -112,13 +52,11 @@ def plot_bar(data, title, outfile):
     plt.title(title)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    outpath = os.path.join("output", "graphs", outfile)
     plt.savefig(outpath)
     plt.show()
+    plt.close()
 
-def plot_results(consonant_combinations, args):
-    consonant_combinations = merge_dict_values(consonant_combinations)
-
+def plot_results(consonant_combinations, args, prefix="", plots=None):
     # Convert the dictionary to a DataFrame for plotting
     df_plot = pd.DataFrame(consonant_combinations.items(), columns=['consonant', 'Count'])
 
@@ -131,7 +69,7 @@ def plot_results(consonant_combinations, args):
         df_plot = df_plot.sort_values(by='Count', 
                                         ascending=False)
 
-    plot_bar(df_plot, "consonant counts", "consonant_counts_bar_plot.png")
+    plot_bar(df_plot, "consonant counts", prefix + "consonant_counts_bar_plot.png", plots=plots)
 
     # Separate consonant sequences into monographs, digraphs, and trigraphs
     monographs = []
@@ -165,7 +103,7 @@ def plot_results(consonant_combinations, args):
         df_monographs = pd.DataFrame(monographs_data.items(), 
                                     columns=['consonant', 'Count']).sort_values(by='Count', 
                                                                             ascending=False)
-    plot_bar(df_monographs, 'Count of Monographs', 'monographs_bar_plot.png')
+    plot_bar(df_monographs, 'Count of Monographs', prefix + 'monographs_bar_plot.png', plots=plots)
 
     # Plot digraphs
     digraphs_data = {key: consonant_combinations[key] for key in digraphs}
@@ -177,7 +115,7 @@ def plot_results(consonant_combinations, args):
         df_digraphs = pd.DataFrame(digraphs_data.items(), 
                         columns=['consonant', 'Count']).sort_values(by='Count', 
                                                                 ascending=False)
-    plot_bar(df_digraphs, 'Count of Digraphs', 'digraphs_bar_plot.png')
+    plot_bar(df_digraphs, 'Count of Digraphs', prefix + 'digraphs_bar_plot.png', plots=plots)
 
     # Plot trigraphs
     trigraphs_data = {key: consonant_combinations[key] for key in trigraphs}
@@ -189,7 +127,7 @@ def plot_results(consonant_combinations, args):
         df_trigraphs = pd.DataFrame(trigraphs_data.items(), 
                             columns=['consonant', 'Count']).sort_values(by='Count', 
                                                                     ascending=False)
-    plot_bar(df_trigraphs, 'Count of Trigraphs', 'trigraphs_bar_plot.png')
+    plot_bar(df_trigraphs, 'Count of Trigraphs', prefix + 'trigraphs_bar_plot.png', plots=plots)
 
     #plot tetragraphs
     tetragraphs_data = {key: consonant_combinations[key] for key in tetragraphs}
@@ -201,7 +139,7 @@ def plot_results(consonant_combinations, args):
         df_tetragraphs = pd.DataFrame(tetragraphs_data.items(), 
                                     columns = ["consonant","Count"]).sort_values(by="Count", 
                                                                             ascending=False)
-    plot_bar(df_tetragraphs, "Count of Tetragraphs", "tetragraphs_bar_plot.png")
+    plot_bar(df_tetragraphs, "Count of Tetragraphs", prefix + "tetragraphs_bar_plot.png", plots=plots)
 
     #plot pentagraphs
     pentagraphs_data = {key: consonant_combinations[key] for key in pentagraphs}
@@ -213,7 +151,7 @@ def plot_results(consonant_combinations, args):
         df_pentagraphs = pd.DataFrame(pentagraphs_data.items(), 
                                     columns = ["consonant","Count"]).sort_values(by="Count", 
                                                                             ascending=False)
-    plot_bar(df_pentagraphs, "Count of Pentagraphs", "pentagraphs_bar_plot.png")
+    plot_bar(df_pentagraphs, "Count of Pentagraphs", prefix + "pentagraphs_bar_plot.png", plots=plots)
 
      #plot hexagraphs
     hexagraphs_data = {key: consonant_combinations[key] for key in hexagraphs}
@@ -225,13 +163,11 @@ def plot_results(consonant_combinations, args):
         df_hexagraphs = pd.DataFrame(hexagraphs_data.items(), 
                                     columns = ["consonant","Count"]).sort_values(by="Count", 
                                                                             ascending=False)
-    plot_bar(df_hexagraphs, "Count of Hexagraphs", "hexagraphs_bar_plot.png")
+    plot_bar(df_hexagraphs, "Count of Hexagraphs", prefix + "hexagraphs_bar_plot.png", plots=plots)
 
     return None
 
-def save_tables(consonant_combinations, args):
-    consonant_combinations = merge_dict_values(consonant_combinations)
-
+def save_tables(consonant_combinations, args, outfile=None):
     # Initialize lists to store data for the table
     monographs = []
     monographs_freq = []
@@ -315,7 +251,7 @@ def save_tables(consonant_combinations, args):
 
     # create and save tabular data
     df_table = pd.DataFrame(table_data)
-    df_outpath = os.path.join("output", "frequencies", args.filename)
+    df_outpath = os.path.join("output", "frequencies", outfile or args.filename)
     df_table.to_excel(df_outpath, index=False)
 
     return None
@@ -323,11 +259,17 @@ def save_tables(consonant_combinations, args):
 def main():
     args = input_parse()
     # load data
-    df = load_data(args.filename)
+    df = graph_counts.load_data(args.filename)
     # process all the consonant combos
-    consonant_combinations = process_consonants(df)
+    consonant_combinations = process_consonants(df, args.convention)
     # save visualizations
-    plot_results(consonant_combinations, args)
+    if args.batch:
+        batch_plot.headless()
+        plots = []
+        plot_results(consonant_combinations, args, plots=plots)
+        batch_plot.render(plots, args.workers)
+    else:
+        plot_results(consonant_combinations, args)
     # save output tables
     save_tables(consonant_combinations, args)
 
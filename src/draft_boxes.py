@@ -0,0 +1,90 @@
+import os
+import re
+import argparse
+import numpy as np
+import pandas as pd
+import sound_position
+
+def input_parse():
+    # Define argparse to get the annotated document
+    parser = argparse.ArgumentParser(description="Drafts one box per sound position from an annotated, segmented wordlist, for manual correction.")
+    parser.add_argument("-f",
+                        "--filename",
+                        required=True,
+                        help="Annotated file in data/4_annotated_segmented")
+    parser.add_argument("-m",
+                        "--min_frequency",
+                        type=int,
+                        default=0,
+                        help="Leave out sound positions occurring fewer times than this")
+    args = parser.parse_args()
+
+    return args
+
+def position_cube(aligned):
+    """
+    frequency of every graph in every (sound position, word) pair, from the
+    aligned table of cluster_positions(..., with_graphs=True). Missing
+    combinations are NaN, so they come out as empty cells.
+    """
+    aligned = aligned.astype({"sound_position": str, "graph": str})
+    cube = aligned.groupby(["sound_position", "word", "graph"], sort=False)["frequency"].sum().unstack("graph")
+
+    return cube.sort_index(level="sound_position", sort_remaining=False)
+
+def draft_box(cube, position):
+    """
+    the box of one sound position in the layout leading_graph.py reads: a word
+    column, an empty morpheme_type column for the annotator, and a
+    frequency_<graph> column for every allograph, most frequent words first
+    """
+    box = cube.loc[position].dropna(axis=1, how="all")
+    order = np.lexsort((box.index.to_numpy(dtype=str), -box.sum(axis=1).to_numpy()))
+    box = box.iloc[order]
+    # allographs by overall frequency, the likely leading graph first
+    box = box[box.sum().sort_values(ascending=False, kind="stable").index]
+    box.columns = [f"frequency_{graph}" for graph in box.columns]
+    box.insert(0, "morpheme_type", None)
+
+    return box.rename_axis("word").reset_index()
+
+# characters that cannot appear in file names
+UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+def box_filename(position, taken):
+    # file name for a box, numbered if two sound positions end up with the same one
+    name = UNSAFE_CHARS.sub("_", position) or "_"
+    candidate = name
+    number = 2
+    while candidate.lower() in taken:
+        candidate = f"{name}_{number}"
+        number += 1
+    taken.add(candidate.lower())
+
+    return candidate + ".xlsx"
+
+def main():
+    args = input_parse()
+    inpath = os.path.join("data", "4_annotated_segmented", args.filename)
+    df = pd.read_excel(inpath)
+    df.drop(columns=["Label", "Translation", "Notes"], inplace=True)
+
+    # sound positions with the graphs realising them, then everything in one pivot
+    aligned = sound_position.cluster_positions(df, with_graphs=True)
+    cube = position_cube(aligned)
+    totals = cube.sum(axis=1).groupby(level="sound_position", sort=False).sum()
+
+    outdir = os.path.join("data", "5_boxes_raw", os.path.splitext(args.filename)[0])
+    os.makedirs(outdir, exist_ok=True)
+    taken = set()
+    written = 0
+    for position, total in totals.items():
+        if total < args.min_frequency:
+            continue
+        draft_box(cube, position).to_excel(os.path.join(outdir, box_filename(position, taken)), index=False)
+        written += 1
+
+    print(f"\n[INFO]: {written} draft boxes have been saved to {outdir}\n")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import re
+import pandas as pd
+import inventory
+
+CLUSTER_PATTERN = re.compile(r'\:(.*?)\:')
+# punctuation left out of a graph when counts are merged, so (i), |j| and ‖u‖ count with i, j and u
+PUNCTUATION = re.compile(r'[^\w\s]')
+# *..* spans go first, so a ! inside them does not start a !..! span
+EXCLUDED_SPANS = [re.compile(r'\*.*?\*'), re.compile(r'\!.*?\!')]
+
+def patterns(convention):
+    """
+    runs of vowels, longest graphs first, with an optional h, and single
+    consonants, from the inventories of a transcription convention
+    """
+    graphs = inventory.convention(convention)
+
+    return graphs["vowels"].sequence_pattern(suffix="h"), graphs["consonants"].pattern
+
+def load_data(filename):
+    # Read a segmented wordlist, with the words lowercased as strings
+    filepath = os.path.join("data", "2_segmented_wordlists", filename)
+    df = pd.read_excel(filepath)
+    df['Token'] = df['Token'].astype(str).str.lower()
+
+    return df
+
+def clean_word(word):
+    # leave out the *..* and !..! spans
+    for span in EXCLUDED_SPANS:
+        word = span.sub('', word)
+
+    return word
+
+def add(combinations, graphs, frequency):
+    for graph in graphs:
+        if graph in combinations:
+            combinations[graph] += frequency
+        else:
+            combinations[graph] = frequency
+
+KINDS = ("vowels", "consonants")
+
+def finders(convention, kinds):
+    # for every kind, a function from a cleaned word to the graphs of that kind in it
+    vowel_pattern, consonant_pattern = patterns(convention)
+    found = {"vowels": vowel_pattern.findall,
+             "consonants": lambda word: CLUSTER_PATTERN.findall(word) or consonant_pattern.findall(word)}
+
+    return [found[kind] for kind in kinds]
+
+def count_graphs(df, convention="default", kinds=KINDS):
+    """
+    vowel sequences and consonant clusters of a segmented wordlist, each as a
+    dict of graph to summed frequency, in the order they are first found.
+    Every word is NFC-normalised and cleaned once and scanned only for the
+    kinds asked for, so a script needing one of them does not pay for the
+    other. A word's consonants are its :..: clusters if it has any,
+    otherwise its single consonants.
+    """
+    scans = finders(convention, kinds)
+    combinations = [{} for kind in kinds]
+    for word, frequency in zip(df["Token"], df["Frequency"]):
+        cleaned = clean_word(inventory.normalize(word.lower()))
+        # removing empty cells
+        if cleaned == "nan":
+            continue
+        for counts, scan in zip(combinations, scans):
+            add(counts, scan(cleaned), frequency)
+
+    return tuple(combinations)
+
+def normalize_key(key):
+    # Remove punctuation using regex
+    return PUNCTUATION.sub('', key)
+
+def merge_counts(combinations):
+    # counts of graphs that differ only in punctuation added up, in first-found order
+    merged = {}
+    for key, value in combinations.items():
+        add(merged, [normalize_key(key)], value)
+
+    return merged
@@ -1,6 +1,11 @@
 import pandas as pd
+import numpy as np
 import os
+import pickle
+import multiprocessing
+import hashlib
 import argparse
+import leading_graph
 
 def input_parse():
     parser = argparse.ArgumentParser(description='Process Excel files and calculate distance.')
@@ -8,35 +13,88 @@ def input_parse():
                         "--files", 
                         nargs='+', 
                         help='Input Excel files')
+    parser.add_argument("-d",
+                        "--directory",
+                        help='Compare every box in this folder of data/6_boxes (use . for all of them)')
+    parser.add_argument("-c",
+                        "--corpus",
+                        nargs='+',
+                        help='Compare the manuscripts in these folders of data/6_boxes, sound position by sound position')
+    parser.add_argument("-m",
+                        "--matrix",
+                        action='store_true',
+                        help='Compute the distance between every pair of boxes instead of the chained distance')
+    parser.add_argument("--metric",
+                        nargs='+',
+                        choices=list(METRICS),
+                        default=["l1"],
+                        help='Distance between two boxes in --matrix mode, or one or more distances in --corpus mode')
+    parser.add_argument("--chunk",
+                        type=int,
+                        default=0,
+                        help='Number of sound positions compared at once in --corpus mode, 0 for all of them')
+    parser.add_argument("-b",
+                        "--bootstrap",
+                        type=int,
+                        default=0,
+                        help='Number of bootstrap replicates for confidence intervals in --matrix mode, 0 for none')
+    parser.add_argument("--confidence",
+                        type=float,
+                        default=0.95,
+                        help='Confidence level of the bootstrap intervals')
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        default=1,
+                        help='Number of processes drawing the bootstrap replicates and permutations')
+    parser.add_argument("-p",
+                        "--permutations",
+                        type=int,
+                        default=0,
+                        help='Number of permutations for a p-value of the distance, 0 for none')
+    parser.add_argument("--seed",
+                        type=int,
+                        default=0,
+                        help='Seed of the bootstrap and the permutations')
+    parser.add_argument("--no_cache",
+                        action='store_true',
+                        help='Read every box from its Excel file instead of the box vector cache')
     parser.add_argument("-o", 
                         '--outfile', 
                         help='Output Excel file path',
                         default='distance_result.xlsx')
 
     args = parser.parse_args()
+    if sum(source is not None for source in [args.files, args.directory, args.corpus]) != 1:
+        parser.error("give one of --files, --directory or --corpus")
+    if args.directory is not None and not args.matrix:
+        parser.error("--directory is only available with --matrix")
+    if args.corpus is not None and (args.matrix or args.bootstrap or args.permutations):
+        parser.error("--corpus cannot be combined with --matrix, --bootstrap or --permutations")
+    if args.corpus is None and len(args.metric) > 1:
+        parser.error("more than one --metric is only available with --corpus")
+    if not args.matrix and args.corpus is None and (args.metric != ["l1"] or args.bootstrap):
+        parser.error("--metric and --bootstrap are only available with --matrix")
+    if not args.matrix and args.permutations and len(args.files) != 2:
+        parser.error("--permutations compares two boxes, or every pair with --matrix")
 
     return args
 
-def process_files(input_names, out_path):
-    dfs = []
-    file_names = []
-
-    # Load dataframes from Excel files
-    for file_name in input_names:
-        file_names.append(file_name)
-        file_path = os.path.join("data", "6_boxes", file_name)
-        dfs.append(pd.read_excel(file_path))
+def process_files(input_names, out_path, store=None, permutations=0, workers=1, seed=0):
+    # Load the percentages of every box, from the store if there is one
+    rows = read_boxes(input_names, store)
+    file_names = list(input_names)
 
     # Extract frequency column headers
-    freq_columns = [list(df.columns[df.columns.str.startswith('frequency')]) for df in dfs]
+    freq_columns = [list(row.index) for row in rows]
 
     # Create a new dataframe with unique graphemes from all files
     graphemes = list(set(sum(freq_columns, [])))
     result_df = pd.DataFrame({'graphemes': graphemes})
 
     # Extract frequencies for soundposition columns from the last row for each file
-    for i, df in enumerate(dfs):
-        result_df[file_names[i]] = result_df['graphemes'].map(lambda x: df[x].iloc[-1] if x in df.columns else 0)
+    for i, row in enumerate(rows):
+        result_df[file_names[i]] = result_df['graphemes'].map(lambda x: row[x] if x in row.index else 0)
 
     # Add the "distance" column
     result_df['distance'] = result_df.iloc[:, 1:].diff(axis=1).abs().sum(axis=1)
@@ -45,17 +103,605 @@ def process_files(input_names, out_path):
     result_df.loc['Total', 'distance'] = result_df['distance'].sum()
     result_df.loc['Average', 'distance'] = result_df.loc['Total', 'distance'] / len(input_names)
 
+    # How often relabelling the words of the two boxes gives a distance at least as large
+    if permutations:
+        word_rows = box_word_rows(input_names, sorted(set(graphemes)), store)
+        p_values = permutation_test(word_rows, [(0, 1)], "l1", permutations, workers, seed)
+        result_df.loc['p-value', 'distance'] = p_values[0]
+
     # Save to Excel
     result_df.to_excel(out_path, index=False)
 
     # Display the resulting dataframe
     print(result_df)
 
+def list_boxes(directory):
+    # every box under a folder of data/6_boxes, relative to data/6_boxes
+    boxdir = os.path.join("data", "6_boxes")
+    boxes = []
+    for root, dirs, files in os.walk(os.path.join(boxdir, directory)):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.endswith(".xlsx") and not file_name.startswith("~$") and file_name != leading_graph.SUMMARY_NAME:
+                boxes.append(os.path.relpath(os.path.join(root, file_name), boxdir))
+
+    return boxes
+
+def read_sheet(file_name):
+    # the frequency columns of a box
+    df = pd.read_excel(os.path.join("data", "6_boxes", file_name))
+
+    return df[df.columns[df.columns.str.startswith('frequency')]]
+
+def read_box(file_name):
+    # the last (percentage) row of the frequency columns of a box
+    return read_sheet(file_name).iloc[-1]
+
+def sheet_words(sheet):
+    # the word rows of a box, above its Total and Percentage rows, as numbers
+    return sheet.iloc[:-2].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=float)
+
+def box_key(file_path):
+    # what tells whether a box file changed, without reading it
+    stat = os.stat(file_path)
+
+    return (stat.st_mtime_ns, stat.st_size)
+
+def box_hash(file_path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        digest.update(f.read())
+
+    return digest.hexdigest()
+
+class BoxStore:
+    """
+    the percentage vectors of every box read so far, under one shared
+    grapheme vocabulary, in a .npy file that is memory-mapped rather than read,
+    and the word rows of every box stacked in a second one, for resampling.
+    A box is read from Excel again only when its modification time or size
+    changed and its contents did too, and dropped once its file is gone.
+    The vocabulary and the rows, stamp, hash and graphemes of every box are
+    kept in a pickle next to them.
+    """
+    VERSION = 2
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join("data", "6_boxes", "cache", "box_vectors")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.graphemes = []
+        self.boxes = {}
+        self.vectors = np.zeros((0, 0))
+        self.words = np.zeros((0, 0))
+        self.read = 0
+        if all(os.path.exists(path + suffix) for suffix in [".pickle", ".npy", ".words.npy"]):
+            with open(path + ".pickle", "rb") as f:
+                stored = pickle.load(f)
+            # a store written by another version is started again
+            if isinstance(stored, dict) and stored.get("version") == self.VERSION:
+                self.graphemes, self.boxes = stored["graphemes"], stored["boxes"]
+                self.vectors = np.load(path + ".npy", mmap_mode="r")
+                self.words = np.load(path + ".words.npy", mmap_mode="r")
+        self.position = {grapheme: i for i, grapheme in enumerate(self.graphemes)}
+
+    def refresh(self, input_names):
+        # read the boxes that are new or changed, drop the ones deleted or renamed, and save the store if any were
+        fresh = {}
+        stale = [file_name for file_name in self.boxes if not os.path.exists(os.path.join("data", "6_boxes", file_name))]
+        for file_name in stale:
+            del self.boxes[file_name]
+        changed = bool(stale)
+        for file_name in dict.fromkeys(input_names):
+            file_path = os.path.join("data", "6_boxes", file_name)
+            key = box_key(file_path)
+            entry = self.boxes.get(file_name)
+            if entry is not None and entry["key"] == key:
+                continue
+            digest = box_hash(file_path)
+            changed = True
+            if entry is not None and entry["hash"] == digest:
+                # touched but not changed
+                entry["key"] = key
+                continue
+            sheet = read_sheet(file_name)
+            for grapheme in sheet.columns:
+                self.position.setdefault(grapheme, len(self.position))
+            fresh[file_name] = sheet
+            self.boxes[file_name] = {"key": key, "hash": digest,
+                                     "row": entry["row"] if entry is not None else len(self.boxes),
+                                     "graphemes": [self.position[grapheme] for grapheme in sheet.columns],
+                                     "words": entry["words"] if entry is not None else (0, 0)}
+        if fresh or stale:
+            self.rebuild(fresh)
+        if changed:
+            self.save()
+
+    def rebuild(self, fresh):
+        """
+        both arrays again, with the fresh boxes put in and only the boxes and
+        graphemes still in the store kept, the graphemes in the order they
+        were first seen
+        """
+        known = list(self.position)
+        used = sorted(set().union(*(entry["graphemes"] for entry in self.boxes.values())))
+        renumber = {old: new for new, old in enumerate(used)}
+        self.graphemes = [known[i] for i in used]
+        self.position = {grapheme: i for i, grapheme in enumerate(self.graphemes)}
+        vectors = np.zeros((len(self.boxes), len(self.graphemes)))
+        blocks = []
+        start = 0
+        for row, (file_name, entry) in enumerate(self.boxes.items()):
+            columns = [renumber[i] for i in entry["graphemes"]]
+            if file_name in fresh:
+                sheet = fresh[file_name]
+                vectors[row, columns] = pd.to_numeric(sheet.iloc[-1], errors='coerce').to_numpy(dtype=float)
+                words = sheet_words(sheet)
+            else:
+                vectors[row, columns] = self.vectors[entry["row"], entry["graphemes"]]
+                words = self.words[entry["words"][0]:entry["words"][1]][:, entry["graphemes"]]
+            block = np.zeros((len(words), len(self.graphemes)))
+            block[:, columns] = words
+            blocks.append(block)
+            entry["row"] = row
+            entry["graphemes"] = columns
+            entry["words"] = (start, start + len(block))
+            start += len(block)
+        self.vectors = vectors
+        self.words = np.concatenate(blocks) if blocks else np.zeros((0, len(self.graphemes)))
+        self.read += len(fresh)
+
+    def save(self):
+        # written next to the old files and moved over them, so a reader never sees half a store
+        vectors, words = np.array(self.vectors), np.array(self.words)
+        # let go of the memory maps first, a file still mapped cannot be replaced on Windows
+        self.vectors = self.words = None
+        np.save(self.path + ".tmp.npy", vectors)
+        np.save(self.path + ".tmp.words.npy", words)
+        del vectors, words
+        with open(self.path + ".tmp.pickle", "wb") as f:
+            pickle.dump({"version": self.VERSION, "graphemes": self.graphemes, "boxes": self.boxes},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + ".tmp.npy", self.path + ".npy")
+        os.replace(self.path + ".tmp.words.npy", self.path + ".words.npy")
+        os.replace(self.path + ".tmp.pickle", self.path + ".pickle")
+        self.vectors = np.load(self.path + ".npy", mmap_mode="r")
+        self.words = np.load(self.path + ".words.npy", mmap_mode="r")
+
+    def rows(self, input_names):
+        # the last row of every box, as read_box gives it
+        self.refresh(input_names)
+        rows = []
+        for file_name in input_names:
+            entry = self.boxes[file_name]
+            rows.append(pd.Series(self.vectors[entry["row"], entry["graphemes"]],
+                                  index=[self.graphemes[i] for i in entry["graphemes"]], name=file_name))
+
+        return rows
+
+    def matrix(self, input_names):
+        # box_matrix straight from the stored vectors
+        self.refresh(input_names)
+        entries = [self.boxes[file_name] for file_name in input_names]
+        columns = sorted(set().union(*(entry["graphemes"] for entry in entries)), key=self.graphemes.__getitem__)
+        matrix = self.vectors[[entry["row"] for entry in entries]][:, columns]
+
+        return [self.graphemes[i] for i in columns], np.nan_to_num(matrix, nan=0.0)
+
+    def word_rows(self, input_names, graphemes):
+        # the word rows of every box, over the given graphemes
+        self.refresh(input_names)
+        columns = [self.position[grapheme] for grapheme in graphemes]
+
+        return [self.words[slice(*self.boxes[file_name]["words"])][:, columns] for file_name in input_names]
+
+    def report(self, input_names):
+        return f"{len(set(input_names))} boxes, {self.read} read from Excel, the rest from {self.path}.npy"
+
+def read_boxes(input_names, store=None):
+    # the last rows of the boxes, through the store if there is one
+    if store is None:
+        return [read_box(file_name) for file_name in input_names]
+
+    return store.rows(input_names)
+
+def box_word_rows(input_names, graphemes, store=None):
+    """
+    the word rows of every box, each an array with one column per grapheme in
+    graphemes (0 where a box does not have it). The Total row of a box is
+    their sum, and its Percentage row that sum in percent of the whole.
+    """
+    if store is not None:
+        return store.word_rows(input_names, graphemes)
+    position = {grapheme: i for i, grapheme in enumerate(graphemes)}
+    word_rows = []
+    for file_name in input_names:
+        sheet = read_sheet(file_name)
+        words = np.zeros((len(sheet) - 2, len(graphemes)))
+        words[:, [position[grapheme] for grapheme in sheet.columns]] = sheet_words(sheet)
+        word_rows.append(words)
+
+    return word_rows
+
+def box_matrix(input_names, store=None):
+    """
+    the percentages of every box as the rows of one matrix, over the sorted
+    union of their graphemes, with 0 where a box does not have a grapheme
+    """
+    if store is not None:
+        return store.matrix(input_names)
+    rows = read_boxes(input_names)
+    graphemes = sorted(set().union(*(row.index for row in rows)))
+    matrix = np.zeros((len(rows), len(graphemes)))
+    position = {grapheme: i for i, grapheme in enumerate(graphemes)}
+    for i, row in enumerate(rows):
+        matrix[i, [position[grapheme] for grapheme in row.index]] = pd.to_numeric(row, errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    return graphemes, matrix
+
+# largest number of values in one block of differences, so memory stays bounded
+BLOCK_VALUES = 1 << 22
+
+def proportions(matrix):
+    # every vector divided by its sum, empty vectors stay 0
+    totals = matrix.sum(axis=-1, keepdims=True)
+
+    return np.divide(matrix, totals, out=np.zeros_like(matrix), where=totals > 0)
+
+def l1(a, b):
+    # summed absolute difference of the percentages, the distance of the chained mode
+    return np.abs(a - b).sum(axis=-1)
+
+def total_variation(a, b):
+    return 0.5 * np.abs(a - b).sum(axis=-1)
+
+def hellinger(a, b):
+    return np.sqrt(0.5 * ((np.sqrt(a) - np.sqrt(b)) ** 2).sum(axis=-1))
+
+def chi_square(a, b):
+    # symmetric chi-square distance, graphemes neither box has add nothing
+    total = a + b
+    squares = (a - b) ** 2
+
+    return 0.5 * np.divide(squares, total, out=np.zeros_like(squares), where=total > 0).sum(axis=-1)
+
+def plogp(p):
+    # p * log2(p), 0 where p is 0
+    return p * np.log2(np.where(p > 0, p, 1))
+
+def jensen_shannon(a, b):
+    # square root of the Jensen-Shannon divergence in bits, between 0 and 1,
+    # written with entropies so only the mixture is computed for every pair
+    m = (a + b) / 2
+    divergence = (plogp(a).sum(axis=-1) + plogp(b).sum(axis=-1)) / 2 - plogp(m).sum(axis=-1)
+
+    return np.sqrt(np.maximum(divergence, 0))
+
+# distance functions between the last axes of broadcast arrays, and whether
+# they compare proportions (True) or the percentages themselves (False)
+METRICS = {
+    "l1": (l1, False),
+    "total_variation": (total_variation, True),
+    "hellinger": (hellinger, True),
+    "chi_square": (chi_square, True),
+    "jensen_shannon": (jensen_shannon, True),
+}
+
+def pairwise_distances(matrix, metric="l1"):
+    """
+    symmetric matrix of the distances between every two rows of matrix, or,
+    for a stack of matrices (..., boxes, graphemes), one matrix per stack
+    entry. Rows are compared with all others a block at a time through
+    broadcasting. The l1 metric is the distance process_files gives for two boxes.
+    """
+    function, normalise = METRICS[metric]
+    if normalise:
+        matrix = proportions(matrix)
+    n, width = matrix.shape[-2:]
+    batch = int(np.prod(matrix.shape[:-2]))
+    distances = np.zeros(matrix.shape[:-1] + (n,), dtype=matrix.dtype)
+    block = max(1, BLOCK_VALUES // max(batch * n * width, 1))
+    for start in range(0, n, block):
+        distances[..., start:start+block, :] = function(matrix[..., start:start+block, None, :], matrix[..., None, :, :])
+
+    # the same value on both sides of the diagonal, whatever the rounding
+    return (distances + np.swapaxes(distances, -1, -2)) / 2
+
+def resample(word_rows, replicates, rng):
+    """
+    percentage vectors of every box for a number of bootstrap replicates, as
+    an array (replicates, boxes, graphemes). Every replicate draws the words
+    of each box with replacement, and sums their rows the way leading_graph
+    does. The draws of all replicates are counted in one bincount, and the
+    counts times the word rows give the sums.
+    """
+    width = word_rows[0].shape[1] if word_rows else 0
+    totals = np.zeros((replicates, len(word_rows), width))
+    for i, words in enumerate(word_rows):
+        n = len(words)
+        if n:
+            draws = rng.integers(0, n, size=(replicates, n)) + np.arange(replicates)[:, None] * n
+            counts = np.bincount(draws.ravel(), minlength=replicates * n).reshape(replicates, n)
+            totals[:, i] = counts @ words
+
+    # single precision halves the memory the distances of all pairs go through
+    return (proportions(totals) * 100).astype(np.float32)
+
+def bootstrap_chunk(word_rows, seed, replicates):
+    # percentage vectors of a chunk of replicates
+    return resample(word_rows, replicates, np.random.default_rng(seed))
+
+# the replicates of every box, set in each worker of the interval pool
+REPLICATES = None
+
+def share_replicates(replicates):
+    global REPLICATES
+    REPLICATES = replicates
+
+def interval_chunk(first, second, metric, quantiles):
+    # quantiles over the replicates of the distance of a chunk of pairs of boxes, first[p] and second[p]
+    distances = paired_distances(REPLICATES[:, first], REPLICATES[:, second], metric)
+
+    return np.quantile(distances, quantiles, axis=0)
+
+# bootstrap replicates per task sent to a worker
+BOOTSTRAP_CHUNK = 250
+
+def bootstrap(word_rows, metric="l1", replicates=1000, confidence=0.95, workers=1, seed=0):
+    """
+    percentile bootstrap interval of the distance between every two boxes,
+    as condensed (lower, upper) arrays. The replicates are split into
+    chunks with their own random streams, so the interval only depends on
+    the seed, not on the number of workers. The distances are then
+    computed and reduced to their quantiles a chunk of pairs at a time, so
+    memory grows with the number of boxes, not with the number of pairs.
+    """
+    sizes = [BOOTSTRAP_CHUNK] * (replicates // BOOTSTRAP_CHUNK) + ([replicates % BOOTSTRAP_CHUNK] if replicates % BOOTSTRAP_CHUNK else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(word_rows, chunk_seed, size) for chunk_seed, size in zip(seeds, sizes)]
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(workers, len(tasks))) as pool:
+            chunks = pool.starmap(bootstrap_chunk, tasks, chunksize=1)
+    else:
+        chunks = [bootstrap_chunk(*task) for task in tasks]
+    vectors = np.concatenate(chunks)
+
+    alpha = (1 - confidence) / 2
+    first, second = np.triu_indices(len(word_rows), k=1)
+    # pairs per chunk, so the distances of a chunk take about BLOCK_VALUES values
+    step = max(1, BLOCK_VALUES // max(replicates * vectors.shape[-1], 1))
+    tasks = [(first[start:start+step], second[start:start+step], metric, [alpha, 1 - alpha]) for start in range(0, len(first), step)]
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(workers, len(tasks)), initializer=share_replicates, initargs=(vectors,)) as pool:
+            intervals = pool.starmap(interval_chunk, tasks, chunksize=1)
+    else:
+        share_replicates(vectors)
+        intervals = [interval_chunk(*task) for task in tasks]
+    share_replicates(None)
+    lower, upper = np.concatenate(intervals, axis=1) if intervals else np.zeros((2, 0))
+
+    return lower, upper
+
+def paired_distances(a, b, metric="l1"):
+    # distance between a[..., i, :] and b[..., i, :], both percentage vectors
+    function, normalise = METRICS[metric]
+    if normalise:
+        a, b = proportions(a), proportions(b)
+
+    return function(a, b)
+
+# permutations scored at once, and permutations per task sent to a worker
+PERMUTATION_BATCH = 1000
+PERMUTATION_CHUNK = 10000
+
+def permutation_count(rows_a, rows_b, metric, seed, permutations):
+    """
+    number of random relabellings of the pooled words of two boxes, keeping
+    their sizes, that are at least as far apart as the boxes themselves.
+    Every batch draws a random key per word and permutation, gives box a
+    the words with the smallest keys, and sums them in one product.
+    """
+    rng = np.random.default_rng(seed)
+    pooled = np.concatenate([rows_a, rows_b])
+    total = pooled.sum(axis=0)
+    n = len(rows_a)
+    observed = paired_distances(proportions(rows_a.sum(axis=0)) * 100, proportions(rows_b.sum(axis=0)) * 100, metric)
+    # rounding in the sums should not make a relabelling that gives the same split count as smaller
+    observed = observed * (1 - 1e-9) - 1e-12
+
+    count = 0
+    for start in range(0, permutations, PERMUTATION_BATCH):
+        size = min(PERMUTATION_BATCH, permutations - start)
+        keys = rng.random((size, len(pooled)))
+        if n:
+            mask = keys <= np.partition(keys, n - 1, axis=1)[:, n - 1:n]
+        else:
+            mask = np.zeros(keys.shape, dtype=bool)
+        sums_a = mask.astype(float) @ pooled
+        sums_b = np.maximum(total - sums_a, 0)
+        distances = paired_distances(proportions(sums_a) * 100, proportions(sums_b) * 100, metric)
+        count += int(np.count_nonzero(distances >= observed))
+
+    return count
+
+def permutation_test(word_rows, pairs, metric="l1", permutations=10000, workers=1, seed=0):
+    """
+    empirical p-value of the distance of every pair of boxes (i, j) in
+    pairs, from permutations of the words of each pair between its two boxes.
+    Each pair gets its own random streams, one per chunk of permutations,
+    so the p-values depend only on the seed, not on the number of workers.
+    """
+    sizes = [PERMUTATION_CHUNK] * (permutations // PERMUTATION_CHUNK) + ([permutations % PERMUTATION_CHUNK] if permutations % PERMUTATION_CHUNK else [])
+    tasks = []
+    for (i, j), pair_seed in zip(pairs, np.random.SeedSequence(seed).spawn(len(pairs))):
+        for chunk_seed, size in zip(pair_seed.spawn(len(sizes)), sizes):
+            tasks.append((word_rows[i], word_rows[j], metric, chunk_seed, size))
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(workers, len(tasks))) as pool:
+            counts = pool.starmap(permutation_count, tasks, chunksize=1)
+    else:
+        counts = [permutation_count(*task) for task in tasks]
+    counts = np.array(counts, dtype=float).reshape(len(pairs), len(sizes)).sum(axis=1)
+
+    return (counts + 1) / (permutations + 1)
+
+def square(condensed_distances, n):
+    # the square matrix of a condensed array
+    distances = np.zeros((n, n))
+    distances[np.triu_indices(n, k=1)] = condensed_distances
+    distances += distances.T
+
+    return distances
+
+def condensed(distances):
+    # the upper triangle row by row, the condensed form scipy uses
+    return distances[np.triu_indices(len(distances), k=1)]
+
+def save_matrix(input_names, graphemes, matrix, distances, out_path, interval=None, p_values=None):
+    """
+    the square matrix as a sheet, with the bounds of its bootstrap interval
+    and the permutation p-values on more sheets if there are any, and the
+    boxes, their vectors and the condensed distances (bounds, p-values) in binary
+    """
+    arrays = {"boxes": np.array(input_names, dtype=str), "graphemes": np.array(graphemes, dtype=str),
+              "vectors": matrix, "condensed": condensed(distances)}
+    with pd.ExcelWriter(out_path) as writer:
+        pd.DataFrame(distances, index=input_names, columns=input_names).to_excel(writer, sheet_name="Sheet1")
+        if interval is not None:
+            for name, bound in zip(["lower", "upper"], interval):
+                pd.DataFrame(square(bound, len(input_names)), index=input_names, columns=input_names).to_excel(writer, sheet_name=name)
+                arrays["condensed_" + name] = bound
+        if p_values is not None:
+            # a box against itself is no evidence of a difference
+            p_square = square(p_values, len(input_names))
+            np.fill_diagonal(p_square, 1)
+            pd.DataFrame(p_square, index=input_names, columns=input_names).to_excel(writer, sheet_name="p_value")
+            arrays["condensed_p_value"] = p_values
+    np.savez(os.path.splitext(out_path)[0] + ".npz", **arrays)
+
+def process_matrix(input_names, out_path, store=None, metric="l1", replicates=0, confidence=0.95, workers=1, seed=0, permutations=0):
+    graphemes, matrix = box_matrix(input_names, store)
+    distances = pairwise_distances(matrix, metric)
+    interval = None
+    p_values = None
+    if replicates or permutations:
+        word_rows = box_word_rows(input_names, graphemes, store)
+    if replicates:
+        interval = bootstrap(word_rows, metric, replicates, confidence, workers, seed)
+    if permutations:
+        pairs = list(zip(*np.triu_indices(len(input_names), k=1)))
+        p_values = permutation_test(word_rows, pairs, metric, permutations, workers, seed)
+    save_matrix(input_names, graphemes, matrix, distances, out_path, interval, p_values)
+    print(pd.DataFrame(distances, index=input_names, columns=input_names))
+
+def corpus_tensor(manuscripts, store=None):
+    """
+    the boxes of several manuscript folders as one array (manuscripts,
+    sound positions, graphemes) of percentages, with a mask of the sound
+    positions each manuscript has. The sound position of a box is its file
+    name within the manuscript folder.
+    """
+    input_names = []
+    manuscript_ids = []
+    position_names = []
+    for i, manuscript in enumerate(manuscripts):
+        for box in list_boxes(manuscript):
+            input_names.append(box)
+            manuscript_ids.append(i)
+            position_names.append(os.path.splitext(os.path.relpath(box, manuscript))[0])
+    graphemes, matrix = box_matrix(input_names, store)
+    positions, position_ids = np.unique(np.array(position_names, dtype=str), return_inverse=True)
+
+    tensor = np.zeros((len(manuscripts), len(positions), len(graphemes)))
+    mask = np.zeros((len(manuscripts), len(positions)), dtype=bool)
+    tensor[manuscript_ids, position_ids] = matrix
+    mask[manuscript_ids, position_ids] = True
+
+    return list(positions), graphemes, tensor, mask, input_names
+
+def corpus_distances(tensor, mask, metric="l1", chunk=0):
+    """
+    the distances between the manuscripts at every sound position, as an
+    array (sound positions, manuscripts, manuscripts) with NaN where one of
+    the two lacks the sound position, and their mean over the sound positions
+    every two manuscripts share. Each chunk of sound positions is one stacked
+    pairwise_distances call, so chunk bounds the memory used at once.
+    """
+    n_positions = tensor.shape[1]
+    chunk = chunk or max(n_positions, 1)
+    distances = np.full((n_positions,) + mask.shape[:1] * 2, np.nan)
+    for start in range(0, n_positions, chunk):
+        present = mask[:, start:start+chunk].T
+        both = present[:, :, None] & present[:, None, :]
+        block = pairwise_distances(np.swapaxes(tensor[:, start:start+chunk], 0, 1), metric)
+        distances[start:start+chunk] = np.where(both, block, np.nan)
+
+    shared = (mask.T[:, :, None] & mask.T[:, None, :]).sum(axis=0)
+    totals = np.nansum(distances, axis=0)
+    aggregate = np.divide(totals, shared, out=np.full(totals.shape, np.nan), where=shared > 0)
+
+    return distances, aggregate, shared
+
+# characters Excel does not allow in sheet names, which are at most 31 characters long
+SHEET_UNSAFE = str.maketrans({char: "_" for char in "[]:*?/\\"})
+
+def sheet_name(name, taken):
+    # a valid sheet name, numbered if two sound positions end up with the same one
+    name = name.translate(SHEET_UNSAFE)[:31] or "_"
+    candidate = name
+    number = 2
+    while candidate.lower() in taken:
+        suffix = f"_{number}"
+        candidate = name[:31 - len(suffix)] + suffix
+        number += 1
+    taken.add(candidate.lower())
+
+    return candidate
+
+def process_corpus(manuscripts, out_path, store=None, metrics=("l1",), chunk=0):
+    """
+    one workbook per metric with the mean distance between the manuscripts,
+    the number of sound positions they share and a sheet per sound position,
+    and the tensor and all distances in one binary file
+    """
+    positions, graphemes, tensor, mask, input_names = corpus_tensor(manuscripts, store)
+    arrays = {"manuscripts": np.array(manuscripts, dtype=str), "positions": np.array(positions, dtype=str),
+              "graphemes": np.array(graphemes, dtype=str), "tensor": tensor, "mask": mask}
+    stem = os.path.splitext(out_path)[0]
+    for metric in metrics:
+        distances, aggregate, shared = corpus_distances(tensor, mask, metric, chunk)
+        with pd.ExcelWriter(f"{stem}_{metric}.xlsx") as writer:
+            pd.DataFrame(aggregate, index=manuscripts, columns=manuscripts).to_excel(writer, sheet_name="aggregate")
+            pd.DataFrame(shared, index=manuscripts, columns=manuscripts).to_excel(writer, sheet_name="shared")
+            taken = {"aggregate", "shared"}
+            for i, position in enumerate(positions):
+                pd.DataFrame(distances[i], index=manuscripts, columns=manuscripts).to_excel(writer, sheet_name=sheet_name(position, taken))
+        arrays["distances_" + metric] = distances
+        arrays["aggregate_" + metric] = aggregate
+        print(f"[INFO]: {metric}: mean distances between the manuscripts\n{pd.DataFrame(aggregate, index=manuscripts, columns=manuscripts)}\n")
+    arrays["shared"] = (mask.T[:, :, None] & mask.T[:, None, :]).sum(axis=0)
+    np.savez(stem + ".npz", **arrays)
+
+    return input_names
+
 def main():
     args = input_parse()
     print(args.outfile)
     outpath = os.path.join("output", "distance", args.outfile)
-    process_files(args.files, outpath)
+    store = None if args.no_cache else BoxStore()
+    if args.corpus is not None:
+        input_names = process_corpus(args.corpus, outpath, store, args.metric, args.chunk)
+        print(f"[INFO]: Distances between {len(args.corpus)} manuscripts have been saved to {os.path.splitext(outpath)[0]}_METRIC.xlsx\n")
+    elif args.matrix:
+        input_names = args.files if args.files is not None else list_boxes(args.directory)
+        process_matrix(input_names, outpath, store, args.metric[0], args.bootstrap, args.confidence, args.workers, args.seed, args.permutations)
+        print(f"\n[INFO]: Distances between {len(input_names)} boxes have been saved to {outpath}\n")
+    else:
+        input_names = args.files
+        process_files(input_names, outpath, store, args.permutations, args.workers, args.seed)
+    if store is not None:
+        print(f"[INFO]: Box vector cache: {store.report(input_names)}\n")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+import os
+import argparse
+import graph_counts
+import inventory
+import batch_plot
+import vowels_plot
+import consonants_plot
+
+def input_parse():
+    # Define argparse to get input, output paths
+    parser = argparse.ArgumentParser(description="Creates the vowel and the consonant visualizations and output tables from one scan of each wordlist, without showing the plots")
+    parser.add_argument("-f",
+                        "--filename",
+                        nargs="+",
+                        required=True,
+                        help="Input filenames, several can be given at once")
+    parser.add_argument("-a",
+                        "--alphabetical",
+                        action="store_true")
+    parser.add_argument("-c",
+                        "--convention",
+                        choices=inventory.conventions(),
+                        default="default",
+                        help="Transcription convention, the graph lists in data/inventories")
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        default=1,
+                        help="Number of processes counting the wordlists and rendering the plots")
+    args = parser.parse_args()
+
+    return args
+
+def count_file(job):
+    # load a wordlist and count its vowels and consonants in the same pass
+    filename, convention = job
+    df = graph_counts.load_data(filename)
+
+    return tuple(map(graph_counts.merge_counts, graph_counts.count_graphs(df, convention)))
+
+def main():
+    args = input_parse()
+    batch_plot.headless()
+    counts = batch_plot.pool_map(count_file, [(filename, args.convention) for filename in args.filename], args.workers)
+
+    # save tables and collect the plots, named after the document so the vowels, the consonants and the documents do not overwrite each other
+    plots = []
+    for filename, (vowel_combinations, consonant_combinations) in zip(args.filename, counts):
+        stem = os.path.splitext(filename)[0]
+        vowels_plot.plot_results(vowel_combinations, args, prefix=f"{stem}_vowel_", plots=plots)
+        vowels_plot.save_tables(vowel_combinations, args, outfile=f"{stem}_vowels.xlsx")
+        consonants_plot.plot_results(consonant_combinations, args, prefix=f"{stem}_consonant_", plots=plots)
+        consonants_plot.save_tables(consonant_combinations, args, outfile=f"{stem}_consonants.xlsx")
+    batch_plot.render(plots, args.workers)
+
+    print(f"\n[INFO]: Results for {len(args.filename)} wordlists, {len(plots)} plots, are saved in the output folder\n")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,150 @@
+import os
+import re
+import json
+import unicodedata
+
+# key marking the end of a graph in a trie node
+END = ""
+# one file of graph lists per transcription convention, found from this file so
+# the modules that read them at import time can be imported from anywhere
+INVENTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "data", "inventories")
+
+def normalize(text):
+    # compare in NFC, so a precomposed ê and an e with a combining circumflex are the same graph
+    return unicodedata.normalize("NFC", text)
+
+def build_trie(graphs):
+    # nested dicts from character to node, a node with END ends a graph
+    trie = {}
+    for graph in graphs:
+        node = trie
+        for char in graph:
+            node = node.setdefault(char, {})
+        node[END] = True
+
+    return trie
+
+def trie_pattern(node):
+    """
+    regular expression for the continuations of a trie node. The branches
+    start with different characters, so at most one of them is followed, and
+    a node that ends a graph makes its continuation optional but greedy, so
+    the longest graph is matched first.
+    """
+    leaves = []
+    branches = []
+    for char, child in node.items():
+        if char == END:
+            continue
+        if child.keys() == {END}:
+            # a graph ending here and going no further, collected into one character class
+            leaves.append(re.escape(char))
+        else:
+            branches.append(re.escape(char) + trie_pattern(child))
+    if len(leaves) == 1:
+        branches.append(leaves[0])
+    elif leaves:
+        branches.append("[" + "".join(leaves) + "]")
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return "(?:" + pattern + ")?" if END in node else pattern
+
+class Inventory:
+    """
+    a set of graphs, single letters and multi-codepoint units such as ‖ẅ‖,
+    (v̊) or œ̂, for matching in NFC-normalised text. The graphs are kept in a
+    trie that is compiled once into an atomic regular expression, so the re
+    engine walks the trie: a graph is found by following one path of at most
+    the length of the longest graph, the longest graph at a position always
+    wins and is never split again to let a longer sequence match, and a scan
+    is linear in the length of the text.
+    """
+    def __init__(self, graphs):
+        self.graphs = list(dict.fromkeys(normalize(graph) for graph in graphs))
+        self.members = frozenset(self.graphs)
+        self.trie = build_trie(self.graphs)
+        # the characters a graph can start with, so the trie is only entered there
+        first = "(?=[" + "".join(sorted({re.escape(graph[0]) for graph in self.graphs})) + "])"
+        self.graph_pattern = first + "(?>" + trie_pattern(self.trie) + ")"
+        self.pattern = re.compile(self.graph_pattern)
+        self.sequences = {}
+
+    def __contains__(self, graph):
+        return graph in self.members
+
+    def __iter__(self):
+        return iter(self.graphs)
+
+    def __len__(self):
+        return len(self.graphs)
+
+    def tokens(self, text):
+        # the graphs in a text, longest match first, skipping everything else
+        return self.pattern.findall(text)
+
+    def sequence_pattern(self, min_length=1, suffix=""):
+        """
+        compiled pattern for min_length or more graphs in a row, followed by
+        an optional suffix, built on first use and kept for the next
+        """
+        key = (min_length, suffix)
+        if key not in self.sequences:
+            pattern = "(?:" + self.graph_pattern + "){" + str(min_length) + ",}"
+            if suffix:
+                pattern += "(?:" + re.escape(suffix) + ")?"
+            self.sequences[key] = re.compile(pattern)
+
+        return self.sequences[key]
+
+def read_lists(name, inheriting=()):
+    """
+    the lists of data/inventories/<name>.json, on top of the lists of the
+    convention it names under "inherits", so a convention only has to give
+    the lists it changes
+    """
+    if name in inheriting:
+        raise ValueError(f"convention {name} inherits from itself through {' -> '.join(inheriting + (name,))}")
+    with open(os.path.join(INVENTORY_DIR, name + ".json"), encoding="utf-8") as f:
+        lists = json.load(f)
+    parent = lists.pop("inherits", None)
+    if parent is None:
+        return lists
+
+    return {**read_lists(parent, inheriting + (name,)), **lists}
+
+class Convention:
+    """
+    the graph lists of one transcription convention, read from
+    data/inventories/<name>.json: the vowels and consonants of the plotting
+    scripts and the parser_vowels of word_parser.py. Each list is compiled
+    into an Inventory the first time it is asked for.
+    """
+    def __init__(self, name):
+        self.lists = read_lists(name)
+        self.name = name
+        self.inventories = {}
+
+    def graphs(self, kind):
+        return self.lists[kind]
+
+    def __getitem__(self, kind):
+        if kind not in self.inventories:
+            self.inventories[kind] = Inventory(self.lists[kind])
+
+        return self.inventories[kind]
+
+# conventions read so far in this process
+CONVENTIONS = {}
+
+def convention(name="default"):
+    # the convention of that name, read from its file on first use
+    if name not in CONVENTIONS:
+        CONVENTIONS[name] = Convention(name)
+
+    return CONVENTIONS[name]
+
+def conventions():
+    # names of the conventions there are files for
+    return sorted(os.path.splitext(filename)[0] for filename in os.listdir(INVENTORY_DIR) if filename.endswith(".json"))
@@ -1,21 +1,31 @@
+import os
+import re
 import argparse
+import numpy as np
 import pandas as pd
 
 def input_parse():
     # Define argparse to get input, output paths
     parser = argparse.ArgumentParser(description="Process data and calculate percentages.")
-    parser.add_argument("-i", 
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-i", 
                         "--input_file", 
-                        required=True, 
                         help="Path to the input Excel file")
+    source.add_argument("-d",
+                        "--directory",
+                        help="Process every box in this folder of data/5_boxes_raw (use . for all of them)")
     parser.add_argument("-o", 
                         "--output_file", 
-                        required=True, 
                         help="Path to save the output Excel file")
     args = parser.parse_args()
+    if args.input_file is not None and args.output_file is None:
+        parser.error("--output_file is required with --input_file")
     
     return args
 
+# file the leading graphs of a folder of boxes are saved to
+SUMMARY_NAME = "leading_graphs.xlsx"
+
 def read_data(file_path):
     # Read data from Excel file
     df = pd.read_excel(file_path)
@@ -23,20 +33,20 @@ def read_data(file_path):
     return df
 
 def transform_data(df, frequency_columns):
-    # Convert empty cells to zeros
-    df = df.apply(lambda x: x.apply(lambda y: 0 if pd.isna(y) else y))
+    # Convert empty cells to zeros, columns with nothing in them become whole numbers
+    empty_columns = df.columns[df.isna().all()] if len(df) else []
+    df = df.fillna(0)
+    df[empty_columns] = df[empty_columns].astype(int)
 
     # Convert frequency columns to numeric
-    for column in frequency_columns:
-        df[column] = pd.to_numeric(df[column], errors='coerce').astype(float)
-
-    # Iterate over rows and update cells with percentages
-    for index, row in df.iterrows():
-        values = [row[column] for column in frequency_columns]
-        total_sum = sum(filter(pd.notna, values)) or 1
+    values = df[frequency_columns].apply(pd.to_numeric, errors='coerce').astype(float)
 
-        for column, value in zip(frequency_columns, values):
-            df.at[index, column] = value / total_sum
+    # Divide every row by its total, summed column by column as the cells are read
+    total_sum = np.zeros(len(df))
+    for column in frequency_columns:
+        total_sum = total_sum + values[column].fillna(0).to_numpy()
+    total_sum[total_sum == 0] = 1
+    df[frequency_columns] = values.div(total_sum, axis=0)
 
     return df
 
@@ -53,14 +63,22 @@ def calculate_percentage(df, frequency_columns):
 
     return df
 
-def save_data(df, out_path):
-    # Save the DataFrame to Excel file
-    df.to_excel(out_path, index=False)
-
-if __name__ == "__main__":
-    args = input_parse()
+def leading_graph(df, frequency_columns, threshold=50):
+    """
+    the allograph covering more than threshold percent of the box, from the
+    Percentage row, with its percentage, or (None, highest percentage)
+    """
+    percentages = df.loc['Percentage', frequency_columns].astype(float)
+    if percentages.isna().all():
+        return None, np.nan
+    column = percentages.idxmax()
+    if percentages[column] > threshold:
+        return re.sub(r"^frequency[_\s]*", "", column) or column, percentages[column]
+
+    return None, percentages[column]
+
+def process_box(inpath, outpath):
     # Read data
-    inpath = os.path.join("data", "5_boxes_raw", args.input_file)
     data_frame = read_data(inpath)
 
     # Identify frequency columns dynamically
@@ -73,5 +91,40 @@ if __name__ == "__main__":
     data_with_percentages = calculate_percentage(transformed_data, frequency_columns)
 
     # Save data
-    outpath = os.path.join("data", "6_boxes", args.output_file)
     save_data(data_with_percentages, outpath)
+
+    return leading_graph(data_with_percentages, frequency_columns)
+
+def save_data(df, out_path):
+    # Save the DataFrame to Excel file
+    df.to_excel(out_path, index=False)
+
+def main():
+    args = input_parse()
+    if args.input_file is not None:
+        inpath = os.path.join("data", "5_boxes_raw", args.input_file)
+        outpath = os.path.join("data", "6_boxes", args.output_file)
+        graph, percentage = process_box(inpath, outpath)
+        print(f"\n[INFO]: Leading graph of {args.input_file}: {graph} ({percentage:.1f}%)\n")
+        return
+
+    # every box under the folder, saved under the same name in data/6_boxes
+    indir = os.path.normpath(os.path.join("data", "5_boxes_raw", args.directory))
+    outdir = os.path.normpath(os.path.join("data", "6_boxes", args.directory))
+    leading = []
+    for root, dirs, files in os.walk(indir):
+        dirs.sort()
+        for file_name in sorted(files):
+            if not file_name.endswith(".xlsx") or file_name.startswith("~$"):
+                continue
+            box = os.path.relpath(os.path.join(root, file_name), indir)
+            os.makedirs(os.path.join(outdir, os.path.dirname(box)), exist_ok=True)
+            graph, percentage = process_box(os.path.join(indir, box), os.path.join(outdir, box))
+            leading.append({'box': box, 'leading_graph': graph, 'percentage': percentage})
+
+    summary_path = os.path.join(outdir, SUMMARY_NAME)
+    pd.DataFrame(leading, columns=['box', 'leading_graph', 'percentage']).to_excel(summary_path, index=False)
+    print(f"\n[INFO]: {len(leading)} boxes have been saved to {outdir}, leading graphs in {summary_path}\n")
+
+if __name__ == "__main__":
+    main()
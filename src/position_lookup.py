@@ -0,0 +1,171 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+def input_parse():
+    # Define argparse to get the indexes and the query
+    parser = argparse.ArgumentParser(description="Looks up sound positions and words in the indexes saved by sound_position.py")
+    parser.add_argument("-f",
+                        "--filename",
+                        nargs="+",
+                        required=True,
+                        help="Annotated documents to look in, several can be given at once")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("-p",
+                       "--position",
+                       help="List the words realising this sound position")
+    query.add_argument("-w",
+                       "--word",
+                       help="List the sound positions of this word")
+    query.add_argument("-t",
+                       "--totals",
+                       action="store_true",
+                       help="Show the number of words and occurrences of every sound position")
+    args = parser.parse_args()
+
+    return args
+
+def make_index(documents, positions, words, frequencies):
+    """
+    index over the rows of one or more clustered tables, given as arrays of
+    (document, sound position, word, frequency) per row. Rows are kept sorted
+    by sound position, and words by spelling, so both can be found by
+    binary search. An entry is a word in one document.
+    """
+    document_names, document_ids = np.unique(np.asarray(documents, dtype=str), return_inverse=True)
+    position_names, position_ids = np.unique(np.asarray(positions, dtype=str), return_inverse=True)
+    word_names, word_ids = np.unique(np.asarray(words, dtype=str), return_inverse=True)
+
+    # at least one document, so the entry numbers below stay defined for an empty table
+    n_documents = max(len(document_names), 1)
+    entries, row_entries = np.unique(word_ids.astype(np.int64) * n_documents + document_ids, return_inverse=True)
+    entry_frequencies = np.zeros(len(entries), dtype=np.float64)
+    entry_frequencies[row_entries] = np.asarray(frequencies, dtype=np.float64)
+
+    # rows by sound position, in table order within each one
+    order = np.argsort(position_ids, kind="stable")
+    position_offsets = np.zeros(len(position_names) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(position_ids, minlength=len(position_names)), out=position_offsets[1:])
+    # and the sound positions of every entry, in table order
+    by_entry = np.argsort(row_entries, kind="stable")
+    entry_offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row_entries, minlength=len(entries)), out=entry_offsets[1:])
+
+    return {"documents": document_names,
+            "positions": position_names,
+            "words": word_names,
+            "entry_words": (entries // n_documents).astype(np.int32),
+            "entry_documents": (entries % n_documents).astype(np.int32),
+            "entry_frequencies": entry_frequencies,
+            "position_offsets": position_offsets,
+            "position_entries": row_entries[order].astype(np.int32),
+            "entry_offsets": entry_offsets,
+            "entry_positions": position_ids[by_entry].astype(np.int32)}
+
+def index_path(filename):
+    return os.path.join("output", "clustered", filename.split(".")[0]+".npz")
+
+def save_index(index, path):
+    np.savez(path, **index)
+
+def rows(index):
+    """
+    the indexed rows again, as (document, sound position, word, frequency)
+    arrays, entry by entry with the sound positions of each in table order,
+    so make_index keeps that order when indexes are merged
+    """
+    entries = np.repeat(np.arange(len(index["entry_words"])), np.diff(index["entry_offsets"]))
+
+    return (index["documents"][index["entry_documents"][entries]], index["positions"][index["entry_positions"]],
+            index["words"][index["entry_words"][entries]], index["entry_frequencies"][entries])
+
+def load_index(filenames):
+    """
+    read the index of one annotated document into memory, or of several
+    merged into one index
+    """
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    indexes = []
+    for filename in filenames:
+        with np.load(index_path(filename)) as data:
+            indexes.append({key: data[key] for key in data.files})
+    if len(indexes) == 1:
+        return indexes[0]
+
+    merged = [np.concatenate(columns) for columns in zip(*map(rows, indexes))]
+
+    return make_index(*merged)
+
+def find(names, name):
+    # position of a name in a sorted array of names, or None
+    i = np.searchsorted(names, name)
+    if i < len(names) and names[i] == name:
+        return i
+
+    return None
+
+def words_for(index, position):
+    """
+    the words realising a sound position, as tuples of
+    (document, word, frequency, times the position occurs in the word)
+    """
+    i = find(index["positions"], position)
+    if i is None:
+        return []
+    entries, counts = np.unique(index["position_entries"][index["position_offsets"][i]:index["position_offsets"][i+1]], return_counts=True)
+
+    return [(str(index["documents"][index["entry_documents"][entry]]), str(index["words"][index["entry_words"][entry]]),
+             float(index["entry_frequencies"][entry]), int(count)) for entry, count in zip(entries, counts)]
+
+def positions_for(index, word):
+    """
+    the sound positions of a word in every document it appears in, as tuples
+    of (document, frequency, sound positions)
+    """
+    i = find(index["words"], word)
+    if i is None:
+        return []
+    first, last = np.searchsorted(index["entry_words"], [i, i + 1])
+    offsets = index["entry_offsets"]
+
+    return [(str(index["documents"][index["entry_documents"][entry]]), float(index["entry_frequencies"][entry]),
+             index["positions"][index["entry_positions"][offsets[entry]:offsets[entry+1]]].tolist())
+            for entry in range(first, last)]
+
+def totals(index):
+    """
+    for every sound position, the number of words realising it and the
+    number of occurrences, counting every word as often as it appears
+    """
+    offsets = index["position_offsets"]
+    entries = index["position_entries"]
+    position_ids = np.repeat(np.arange(len(index["positions"])), np.diff(offsets))
+    # a word with the same sound position twice is one word but two occurrences per appearance
+    n_entries = max(len(index["entry_words"]), 1)
+    distinct = np.unique(position_ids.astype(np.int64) * n_entries + entries) // n_entries
+
+    return pd.DataFrame({"sound_position": index["positions"],
+                         "words": np.bincount(distinct, minlength=len(index["positions"])),
+                         "occurrences": np.bincount(position_ids, weights=index["entry_frequencies"][entries],
+                                                    minlength=len(index["positions"]))})
+
+def main():
+    args = input_parse()
+    index = load_index(args.filename)
+    if args.position is not None:
+        results = words_for(index, args.position)
+        for document, word, frequency, count in results:
+            print(f"{document:<30}  {word:<30}  {frequency:>8g}  {count:>3}")
+        print(f"\n[INFO]: {len(results)} words realise {args.position} in {', '.join(args.filename)}\n")
+    elif args.word is not None:
+        results = positions_for(index, args.word)
+        for document, frequency, positions in results:
+            print(f"{document:<30}  {frequency:>8g}  {' '.join(positions)}")
+        print(f"\n[INFO]: {args.word} appears in {len(results)} of the documents\n")
+    else:
+        print(totals(index).to_string(index=False))
+
+if __name__=="__main__":
+    main()
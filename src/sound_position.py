@@ -1,7 +1,9 @@
 import os
 import argparse
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import position_lookup
 
 def input_parse():
     parser = argparse.ArgumentParser()
@@ -20,6 +22,46 @@ def input_parse():
 
     return args
 
+# graphs that are not counted as a sound position
+EXCLUDE_CHARS = ['#', '<de>', '<en>', '[ig]', 'h', 'l', 'v','|ß|','ü']
+
+def cluster_positions(df, exclude_chars=EXCLUDE_CHARS, with_graphs=False):
+    """
+    one row per sound position of every word in an annotated sheet, where
+    each word row (frequency, graphs) is followed by its annotation row.
+    The sheet is split into word and annotation rows in one go, and the
+    annotations are filtered with a mask over the whole block. With
+    with_graphs, a graph column gives the graph annotated with each sound position.
+    """
+    if len(df) % 2:
+        raise ValueError("the annotated sheet should have an annotation row under every word row")
+    frequencies = df.iloc[0::2, 0].to_numpy()
+    graphs = df.iloc[0::2, 1:].to_numpy(dtype=object)
+    annotations = df.iloc[1::2, 1:].to_numpy(dtype=object)
+
+    # the word is its graphs glued together, skipping the empty cells
+    words = np.full(len(graphs), "", dtype=object)
+    for column in np.where(pd.notnull(graphs), graphs, "").T:
+        words = words + column
+
+    # a word appearing twice keeps its first place, with the sound positions of its last row
+    codes = pd.factorize(pd.Series(words, dtype=object))[0]
+    last = np.flatnonzero(~pd.Series(words, dtype=object).duplicated(keep="last").to_numpy())
+    rows = last[np.argsort(codes[last])]
+
+    keep = pd.notnull(annotations[rows]) & ~pd.DataFrame(annotations[rows]).isin(exclude_chars).to_numpy()
+    pair, column = np.nonzero(keep)
+    source = rows[pair]
+    columns = ['sound_position', 'word', 'frequency'] + (['graph'] if with_graphs else [])
+    if not len(source):
+        return pd.DataFrame([], columns=columns)
+
+    return pd.DataFrame({'sound_position': annotations[source, column],
+                         'word': words[source],
+                         'frequency': frequencies[source],
+                         'graph': graphs[source, column]},
+                        columns=columns)
+
 def main():
     # intialise arguments 
     args = input_parse()
@@ -28,45 +70,15 @@ def main():
     df = pd.read_excel(inpath)
     col_remove = ["Label", "Translation", "Notes"]
     df.drop(columns=col_remove, inplace=True)
-    
-    # get the sound position list
-    exclude_chars = ['#', '<de>', '<en>', '[ig]', 'h', 'l', 'v','|ß|','ü']
-
-    # Create an empty dictionary to store the results
-    word_dict = {}
-
-    # Iterate through every two rows in the dataframe
-    for i in range(0, len(df), 2):
-        # Extract the word and frequency from the first row
-        word = ''.join([x for x in list(df.iloc[i,1:].values) if pd.notnull(x)])
-        frequency = df.iloc[i, 0]
-
-        # Initialize an empty list to store sound positions for the current word
-        sound_positions = []
-
-        # Iterate through the split characters row (the row underneath)
-        for char in df.iloc[i + 1, 1:]:
-            if pd.notnull(char) and char not in exclude_chars:  # Check if the character is not null and not in the exclusion list
-                sound_positions.append(char)
-
-        # Add the word, frequency, and sound positions to the dictionary
-        word_dict[word] = {'frequency': frequency, 'sound_positions': sound_positions}
 
-    result_list = []
-    for word, data in word_dict.items():
-        frequency = data['frequency']
-        sound_positions = data['sound_positions']
-        
-        for sound_position in sound_positions:
-            result_list.append({
-                'sound_position': sound_position,
-                'word': word,
-                'frequency': frequency
-            })
+    # Step 2: pair every word with its annotation and list its sound positions
+    result_df = cluster_positions(df)
 
-    # Step 3: Convert the list of dictionaries into a DataFrame
-    result_df = pd.DataFrame(result_list, 
-                             columns=['sound_position', 'word', 'frequency'])
+    # index the table for position_lookup.py, keeping the sound positions of every word in order
+    document = os.path.splitext(args.filename)[0]
+    index = position_lookup.make_index(np.full(len(result_df), document), result_df['sound_position'],
+                                       result_df['word'], result_df['frequency'])
+    position_lookup.save_index(index, position_lookup.index_path(args.filename))
 
     # Sort the DataFrame based on the 'sound_position' column
     result_df.sort_values(by='sound_position', inplace=True)
@@ -76,6 +88,7 @@ def main():
     result_df.to_excel(outpath, index=False)
 
     print(f"\n[INFO]: The sound positions result has been saved to {outpath}\n")
+    print(f"[INFO]: Its index has been saved to {position_lookup.index_path(args.filename)}\n")
 
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,10 +1,11 @@
 import os
-import re
 import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from collections import defaultdict
+import graph_counts
+import inventory
+import batch_plot
 
 def input_parse():
     # Define argparse to get input, output paths
@@ -16,99 +17,34 @@ def input_parse():
     parser.add_argument("-a",
                         "--alphabetical",
                         action="store_true")
+    parser.add_argument("-c",
+                        "--convention",
+                        choices=inventory.conventions(),
+                        default="default",
+                        help="Transcription convention, the graph lists in data/inventories")
+    parser.add_argument("--batch",
+                        action="store_true",
+                        help="Save the plots without showing them, rendering them in parallel")
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        default=1,
+                        help="Number of processes rendering the plots with --batch")
     args = parser.parse_args()
     
     return args
 
-def load_data(filename):
-    # Read the Excel file
-    filepath = os.path.join("data", "2_segmented_wordlists", filename)
-    df = pd.read_excel(filepath)
-
-    # Assuming your column name is 'Token', and 'Frequency' for the frequency column
-    column_name = 'Token'
-    frequency_column = 'Frequency'
-
-    # Lowercase the words in the column and convert to string type
-    df[column_name] = df[column_name].astype(str).str.lower()
-    
-    return df
-
-def process_vowels(df):
-
-    # Initialize a dictionary to store vowel combinations and their frequencies
-    vowel_combinations = {}
-
-    vowels = [
-        "a","ä","â","à","á","å",
-        "e","ë","ê","è","é",
-        "i","ï","î","ì","í",
-        "o","ö","ô","ø","ò","ó",
-        "u","ü","û","ù","ú","ů",
-        "y","ÿ","ŷ","ỳ","ý",
-        "æ","œ","œ̂","œ̀","œ́",
-        "|j|","|j̈|","|ĵ|","|j́|",
-        "|v|","|v̈|","|v̂|","|v̀|","|v́|","|v̊|",
-        "|w|","|ẅ|","|ŵ|","|ẁ|","|ẃ|","|ẘ|",
-        "(i)","(ï)","(î)","(ì)","(í)",
-        "(y)","(ÿ)","(ŷ)","(ỳ)","(ý)",
-        "(j)","(j̈)","(ĵ)","(j́)",
-        "(u)","(ü)","(û)","(ù)","(ú)","(ů)",
-        "(v)","(v̈)","(v̂)","(v̀)","(v́)","(v̊)",
-        "(w)","(ẅ)","(ŵ)","(ẁ)","(ẃ)","(ẘ)"
-    ]
-
-    # Escape special characters
-    escaped_vowels = [re.escape(v) for v in vowels]
-
-    # Join the list into a single regex pattern with alternation
-    single_vowel_pattern = "(?:" + "|".join(escaped_vowels) + ")h?"
-    # Add an optional "H" at the end of the grouped vowel pattern
-    grouped_vowel_pattern = "(?:" + "|".join(escaped_vowels) + "){2,}h?"
-
-    # Combine both patterns to match either single vowels or groups of vowels with optional "H"
-    final_pattern = grouped_vowel_pattern + "|" + single_vowel_pattern
-
-    # Compile the regex pattern
-    compiled_pattern = re.compile(final_pattern)
-
-    # Iterate through each row in the dataframe
-    for index, row in df.iterrows():
-        word = row["Token"].lower()
-        frequency = row["Frequency"]
-        
-        # Exclude words that begin with '*' or '!'
-        cleaned = re.sub('\*.*?\*', '', word)
-        cleaned = re.sub('\!.*?\!', '', cleaned)
-        # removing empty cells
-        if cleaned=="nan":
-            pass    
-        else:
-            matches = compiled_pattern.findall(cleaned)
-            if matches:
-                for vowel_sequence in matches:
-                    if vowel_sequence in vowel_combinations:
-                        vowel_combinations[vowel_sequence] += frequency
-                    else:
-                        vowel_combinations[vowel_sequence] = frequency
-
-    return vowel_combinations
-
-def normalize_key(key):
-    # Remove punctuation using regex
-    return re.sub(r'[^\w\s]', '', key)
-
-def merge_dict_values(d):
-    merged_dict = defaultdict(int)
-    
-    for key, value in d.items():
-        normalized_key = normalize_key(key)
-        merged_dict[normalized_key] += value
-    
-    return dict(merged_dict)
+def process_vowels(df, convention="default"):
+    # vowel combinations and their frequencies, merged over punctuation, from the shared counting engine
+    return graph_counts.merge_counts(graph_counts.count_graphs(df, convention, ["vowels"])[0])
 
 # Function to plot bar plots
-def plot_bar(data, title, outfile):
+def plot_bar(data, title, outfile, plots=None):
+    outpath = os.path.join("output", "graphs", outfile)
+    if plots is not None:
+        # batch mode, collect the plot for batch_plot to render
+        plots.append(batch_plot.bar_job(data, 'Vowel', title, outpath))
+        return
     plt.figure(figsize=(10, 6))
     plt.bar(data['Vowel'], data['Count'], color='skyblue')
     plt.xlabel('Vowel')
@@ -116,13 +52,11 @@ def plot_bar(data, title, outfile):
     plt.title(title)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    outpath = os.path.join("output", "graphs", outfile)
     plt.savefig(outpath)
     plt.show()
+    plt.close()
 
-def plot_results(vowel_combinations, args):
-    vowel_combinations = merge_dict_values(vowel_combinations)
-
+def plot_results(vowel_combinations, args, prefix="", plots=None):
     # Convert the dictionary to a DataFrame for plotting
     df_plot = pd.DataFrame(vowel_combinations.items(), columns=['Vowel', 'Count'])
     df_plot['Vowel'].str.replace('(', '')
@@ -137,7 +71,7 @@ def plot_results(vowel_combinations, args):
         df_plot = df_plot.sort_values(by='Count', 
                                         ascending=False)
 
-    plot_bar(df_plot, "Vowel counts", "vowel_counts_bar_plot.png")
+    plot_bar(df_plot, "Vowel counts", prefix + "vowel_counts_bar_plot.png", plots=plots)
 
     # Separate vowel sequences into monographs, digraphs, and trigraphs
     monographs = []
@@ -165,7 +99,7 @@ def plot_results(vowel_combinations, args):
         df_monographs = pd.DataFrame(monographs_data.items(), 
                                     columns=['Vowel', 'Count']).sort_values(by='Count', 
                                                                             ascending=False)
-    plot_bar(df_monographs, 'Count of Monographs', 'monographs_bar_plot.png')
+    plot_bar(df_monographs, 'Count of Monographs', prefix + 'monographs_bar_plot.png', plots=plots)
 
     # Plot digraphs
     digraphs_data = {key: vowel_combinations[key] for key in digraphs}
@@ -177,7 +111,7 @@ def plot_results(vowel_combinations, args):
         df_digraphs = pd.DataFrame(digraphs_data.items(), 
                         columns=['Vowel', 'Count']).sort_values(by='Count', 
                                                                 ascending=False)
-    plot_bar(df_digraphs, 'Count of Digraphs', 'digraphs_bar_plot.png')
+    plot_bar(df_digraphs, 'Count of Digraphs', prefix + 'digraphs_bar_plot.png', plots=plots)
 
     # Plot trigraphs
     trigraphs_data = {key: vowel_combinations[key] for key in trigraphs}
@@ -189,7 +123,7 @@ def plot_results(vowel_combinations, args):
         df_trigraphs = pd.DataFrame(trigraphs_data.items(), 
                             columns=['Vowel', 'Count']).sort_values(by='Count', 
                                                                     ascending=False)
-    plot_bar(df_trigraphs, 'Count of Trigraphs', 'trigraphs_bar_plot.png')
+    plot_bar(df_trigraphs, 'Count of Trigraphs', prefix + 'trigraphs_bar_plot.png', plots=plots)
 
     #plot tetragraphs
     tetragraphs_data = {key: vowel_combinations[key] for key in tetragraphs}
@@ -201,13 +135,11 @@ def plot_results(vowel_combinations, args):
         df_tetragraphs = pd.DataFrame(tetragraphs_data.items(), 
                                     columns = ["Vowel","Count"]).sort_values(by="Count", 
                                                                             ascending=False)
-    plot_bar(df_tetragraphs, "Count of Tetragraphs", "tetragraphs_bar_plot.png")
+    plot_bar(df_tetragraphs, "Count of Tetragraphs", prefix + "tetragraphs_bar_plot.png", plots=plots)
 
     return None
 
-def save_tables(vowel_combinations, args):
-    vowel_combinations = merge_dict_values(vowel_combinations)
-
+def save_tables(vowel_combinations, args, outfile=None):
     # Initialize lists to store data for the table
     monographs = []
     monographs_freq = []
@@ -268,7 +200,7 @@ def save_tables(vowel_combinations, args):
 
     # create and save tabular data
     df_table = pd.DataFrame(table_data)
-    df_outpath = os.path.join("output", "frequencies", args.filename)
+    df_outpath = os.path.join("output", "frequencies", outfile or args.filename)
     df_table.to_excel(df_outpath, index=False)
 
     return None
@@ -276,11 +208,17 @@ def save_tables(vowel_combinations, args):
 def main():
     args = input_parse()
     # load data
-    df = load_data(args.filename)
+    df = graph_counts.load_data(args.filename)
     # process all the vowel combos
-    vowel_combinations = process_vowels(df)
+    vowel_combinations = process_vowels(df, args.convention)
     # save visualizations
-    plot_results(vowel_combinations, args)
+    if args.batch:
+        batch_plot.headless()
+        plots = []
+        plot_results(vowel_combinations, args, plots=plots)
+        batch_plot.render(plots, args.workers)
+    else:
+        plot_results(vowel_combinations, args)
     # save output tables
     save_tables(vowel_combinations, args)
 
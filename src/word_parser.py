@@ -1,178 +1,354 @@
 import os
+import re
+import collections
+import multiprocessing
+import itertools
 import pandas as pd
 import numpy as np
 import argparse
+import inventory
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Border, Side, Alignment
 
 
 def input_parse():
     parser = argparse.ArgumentParser()
     #add arguments
     parser.add_argument("-f", "--filename", help = "pick which dataset you want", type = str)
+    parser.add_argument("--no_cache", help = "parse every occurrence of a word instead of remembering parsed words", action = "store_true")
+    parser.add_argument("--cache_size", help = "number of words kept in memory by the parse cache", type = int, default = 100000)
+    parser.add_argument("-w", "--workers", help = "number of processes parsing the words, 1 parses them in this process", type = int, default = 1)
+    parser.add_argument("-c", "--convention", help = "transcription convention, the parser vowels in data/inventories", choices = inventory.conventions(), default = "default")
     # save arguments to be parsed from the CLI
     args = parser.parse_args()
 
     return args
 
+# letters that make up the special strings ‖i‖, ‖y‖, ...
+SPECIAL_LETTERS = "iyujvwIYUJVW"
+# characters that matter while a span is open, everything else belongs to the span
+SPAN_EVENT = re.compile(r"[:|!<>\[()#*]")
+
+def parser_vowels(convention="default"):
+    """
+    the case-sensitive parser vowels of a transcription convention, without
+    lowercasing, escaped for a character class. The parser goes through a word
+    character by character, so every vowel has to be one character in NFC.
+    """
+    graphs = [inventory.normalize(graph) for graph in inventory.convention(convention).graphs("parser_vowels")]
+    longer = [graph for graph in graphs if len(graph) != 1]
+    if longer:
+        raise ValueError(f"the parser_vowels of convention {convention} must be single characters, {', '.join(longer)} are not")
+
+    return "".join(map(re.escape, graphs))
+
+def token_patterns(convention="default"):
+    # the patterns parse uses, for the parser vowels of a convention
+    vowels = parser_vowels(convention)
+    # every token that can start where no :..: |..| !..! <..> or (..) span is open
+    free_token = re.compile(
+        # characters that are a cell of their own, taken as a whole run at once
+        rf"(?P<plain>(?:[^{vowels}‖:|!<>\[()#*]|[{vowels}](?![{vowels}hj])|‖(?![{SPECIAL_LETTERS}]‖))+)"
+        rf"|(?P<special>‖[{SPECIAL_LETTERS}]‖)"
+        # vowel followed by more vowels, h or j
+        rf"|(?P<cluster>[{vowels}][{vowels}hj]+)"
+        r"|(?P<bracket>\[[^\]]*\]?)"
+        r"|(?P<hashes>#+)"
+        r"|(?P<star>\*[^*]*\*?)"
+        r"|(?P<open>[:|!<(])"
+        r"|(?P<close>[>)])"
+    )
+    # the common case in one findall: spans without a nested event inside them,
+    # closed by their own delimiter (or by > or ), as in the loop below)
+    fast_token = re.compile(
+        r":[^:<>()\[#*]*[:>)]|\|[^|<>()\[#*]*[|>)]|![^!<>()\[#*]*[!>)]|[<(][^<>()\[#*]*[>)]"
+        rf"|‖[{SPECIAL_LETTERS}]‖|[{vowels}][{vowels}hj]+"
+        r"|\[[^\]]*\]?|#+|\*[^*]*\*?|[^:|!<>()]"
+    )
+
+    return free_token, fast_token
+
+# the convention parse uses, the default one unless use_convention picks another
+CONVENTION = "default"
+FREE_TOKEN, FAST_TOKEN = token_patterns(CONVENTION)
+
+def use_convention(convention):
+    # parse with the parser vowels of a convention from now on, also run in every worker of the pool
+    global CONVENTION, FREE_TOKEN, FAST_TOKEN
+    FREE_TOKEN, FAST_TOKEN = token_patterns(convention)
+    CONVENTION = convention
+
 # Define the function
 def parse(s: str) -> list[str]:
+    tokens = FAST_TOKEN.findall(s)
+    if sum(map(len, tokens)) == len(s):
+        return tokens
+
+    # some span is unclosed or has something nested in it, go through the word step by step
     tokens = []
     current = 0
     token_start = -1
 
-    # Define list case-sensitive list of Vowels, without lowercasing
-    vowels = ["a", "ä", "æ", "e", "i", "o", "ö", "ø", "u", "ü", "y", 
-              "A", "Ä", "Æ", "E", "I", "O", "Ö", "Ø", "U", "Ü", "Y"]
-    vowel_frequency = {}
-
-    # getting everything wrapped by : :  their own cell
     while current < len(s):
-        if s[current] == ":":
-            if (token_start != -1) and (s[token_start] == ":"):
-                tokens.append(s[token_start : current + 1])
-                token_start = -1
-            elif token_start == -1:
+        if token_start == -1:
+            m = FREE_TOKEN.match(s, current)
+            kind = m.lastgroup
+            if kind == "plain":
+                tokens.extend(m.group())
+            elif kind == "open":
                 token_start = current
-
-        # getting everything wrapped by | | their own cell
-        elif s[current] == "|":
-            if (token_start != -1) and (s[token_start] == "|"):
+            elif kind == "close":
+                # a closing > or ) without an opening one
                 tokens.append(s[token_start : current + 1])
-                token_start = -1
-            elif token_start == -1:
-                token_start = current
+            else:
+                tokens.append(m.group())
+            current = m.end()
+            continue
 
-        # getting everything wrapped by ! ! their own cell
-        elif s[current] == "!":
-            if (token_start != -1) and (s[token_start] == "!"):
+        m = SPAN_EVENT.search(s, current)
+        if m is None:
+            # unclosed span at the end of the word
+            break
+        current = m.start()
+        char = s[current]
+        if char in ":|!":
+            # getting everything wrapped by : :, | | or ! ! their own cell
+            if char == s[token_start]:
                 tokens.append(s[token_start : current + 1])
                 token_start = -1
-            elif token_start == -1:
-                token_start = current
-        
-        #Getting everything wrapped by < > their own cell
-        elif s[current] == "<":
+            current += 1
+        elif char in "<(":
             token_start = current
-        elif s[current] == ">":
+            current += 1
+        elif char in ">)":
             tokens.append(s[token_start : current + 1])
             token_start = -1
-        
-        elif s[current] == "[":
-            # Check for content between "*"
-            next_index = current + 1
-            while next_index < len(s) and s[next_index] != "]":
-                next_index += 1
-
-            # Include content between "*" in the same cell
-            tokens.append(s[current:next_index + 1])
-            current = next_index  # Update current index
-        
-        # Getting everything wrapped by () their own cell
-        elif s[current] == "(":
-            token_start = current
-        elif s[current] == ")":
-            tokens.append(s[token_start : current + 1])
-            token_start = -1
-        
-        #Get consecutive # their own cell
-        elif s[current] == "#":
-            # Check for consecutive "#" symbols
-            next_index = current + 1
-            while next_index < len(s) and s[next_index] == "#":
-                next_index += 1
-
-            tokens.append(s[current:next_index])
-            current = next_index - 1  # Update current index
-
-        elif s[current] == "*":
-            # Check for content between "*"
-            next_index = current + 1
-            while next_index < len(s) and s[next_index] != "*":
-                next_index += 1
-
-            # Include content between "*" in the same cell
-            tokens.append(s[current:next_index + 1])
-            current = next_index  # Update current index
-
-        elif token_start == -1:
-            # Check if the current and next characters are special strings
-            special_strings = ["‖i‖", "‖y‖", "‖u‖", "‖j‖", "‖v‖", "‖w‖", 
-                               "‖I‖", "‖Y‖", "‖U‖", "‖J‖", "‖V‖", "‖W‖"]
-            for string in special_strings:
-                if s.startswith(string, current):
-                    tokens.append(string)
-                    current += len(string) - 1  # Skip the characters of the special string
-                    token_start = -1
-                    break
-            else:
-                # Check if the current and next characters are both vowels
-                if (
-                    current < len(s) - 1
-                    and s[current] in vowels
-                    and (s[current + 1] in vowels or s[current + 1] in {"h", "j"})
-                ):
-                    tokens.append(s[current])
-
-                    # Check for additional characters like "h" or "j"
-                    next_index = current + 1
-                    while (
-                        next_index < len(s)
-                        and (s[next_index] in {"h", "j"} or s[next_index] in vowels)
-                    ):
-                        tokens[-1] += s[next_index]
-                        next_index += 1
-
-                    current = next_index - 1  # Update current index
-                    # Update the vowel_frequency dictionary
-                    #if tokens[-1] in vowel_frequency:
-                    #    vowel_frequency[tokens[-1]] += 1
-                    #else:
-                    #    vowel_frequency[tokens[-1]] = 1
-
-                else:
-                    tokens.append(s[current])
-
-        current += 1
+            current += 1
+        else:
+            # [..], # runs and *..* get their own cell even inside a span
+            m = FREE_TOKEN.match(s, current)
+            tokens.append(m.group())
+            current = m.end()
 
     return tokens
 
-# Adding row of NaN underneath every row 
-def Add_Empty_Values(df):
-    empty_values = np.full_like(df.values, np.nan)
-    data = np.hstack([df.values, empty_values]).reshape(-1, df.shape[1])
-    df_ordered = pd.DataFrame(data, columns=df.columns)
-    return df_ordered
+class ParseCache:
+    """
+    a bounded LRU of parsed words in memory, so a word form repeated in a
+    wordlist or a run is parsed once. Nothing is kept on disk: reading a
+    parsed word back costs more than parsing it again.
+    The returned token lists are shared between calls and should not be modified.
+    """
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.fresh = {}
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, word):
+        tokens = self.entries.get(word)
+        if tokens is not None:
+            self.hits += 1
+            self.entries.move_to_end(word)
+            return tokens
+        # parsed by the process pool in parse_many, or here
+        self.misses += 1
+        tokens = self.fresh.pop(word, None)
+        if tokens is None:
+            tokens = parse(word)
+        self.entries[word] = tokens
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        return tokens
+
+    def parse_many(self, words, workers=1):
+        if workers > 1:
+            # parse the distinct words not in memory once in the pool first
+            missing = [word for word in dict.fromkeys(words) if word not in self.entries]
+            parsed = parse_parallel(missing, workers)
+            graphs = parsed.graphs.tolist()
+            ids = parsed.ids.tolist()
+            offsets = parsed.offsets.tolist()
+            for i, word in enumerate(missing):
+                self.fresh[word] = [graphs[j] for j in ids[offsets[i]:offsets[i+1]]]
+
+        return [self.parse(word) for word in words]
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+
+        return f"{lookups} words, {self.hits} found in memory, {self.misses} parsed ({rate:.1%} hit rate)"
+
+class ParsedGraphs:
+    """
+    parsed words in compressed sparse row form: every distinct graph gets an
+    integer id, and the graphs of word i are
+    graphs[ids[offsets[i]:offsets[i+1]]]. Memory grows with the total number
+    of graphs rather than with the number of words times the longest word.
+    """
+    def __init__(self, graphs, ids, offsets):
+        self.graphs = graphs
+        self.ids = ids
+        self.offsets = offsets
+
+    @classmethod
+    def from_lists(cls, parsed):
+        # intern the graphs of a list of token lists
+        lengths = np.fromiter(map(len, parsed), dtype=np.int64, count=len(parsed))
+        offsets = np.zeros(len(parsed) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        flat = list(itertools.chain.from_iterable(parsed))
+        codes, graphs = pd.factorize(pd.Series(flat, dtype=object))
+
+        return cls(graphs.to_numpy(dtype=object), codes.astype(np.int32), offsets)
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        join parsed chunks in their order. Graphs are numbered by first
+        appearance, as from_lists would number them for all words at once.
+        """
+        numbers = {}
+        ids = [np.zeros(0, dtype=np.int32)]
+        lengths = []
+        for part in parts:
+            remap = np.array([numbers.setdefault(graph, len(numbers)) for graph in part.graphs.tolist()], dtype=np.int32)
+            ids.append(remap[part.ids])
+            lengths.append(part.lengths())
+        offsets = np.zeros(sum(map(len, lengths)) + 1, dtype=np.int64)
+        if lengths:
+            np.cumsum(np.concatenate(lengths), out=offsets[1:])
+        graphs = np.empty(len(numbers), dtype=object)
+        graphs[:] = list(numbers)
+
+        return cls(graphs, np.concatenate(ids), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def word(self, i):
+        # the graphs of one word, as parse returned them
+        return self.graphs[self.ids[self.offsets[i]:self.offsets[i+1]]].tolist()
+
+    def to_wide(self, prefix="Token_"):
+        # one column per graph position, as in the Excel output, padded with None
+        lengths = self.lengths()
+        width = int(lengths.max()) if len(self) else 0
+        wide = np.full((len(self), width), None, dtype=object)
+        rows = np.repeat(np.arange(len(self)), lengths)
+        cols = np.arange(len(self.ids)) - np.repeat(self.offsets[:-1], lengths)
+        wide[rows, cols] = self.graphs[self.ids]
+
+        return pd.DataFrame(wide, columns=[f"{prefix}{i}" for i in range(width)])
+
+    def save(self, path):
+        np.savez(path, graphs=self.graphs.astype(str), ids=self.ids, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["graphs"].astype(object), data["ids"], data["offsets"])
+
+# smallest chunk sent to a worker, below this the pickling costs more than the parsing
+MIN_CHUNK = 5000
+# chunks per worker, so a slow chunk does not leave the other workers idle
+CHUNKS_PER_WORKER = 4
+
+def parse_chunk(words):
+    # run in the worker processes, the graphs go back in compact form
+    return ParsedGraphs.from_lists([parse(word) for word in words])
+
+def parse_parallel(words, workers, chunksize=None):
+    """
+    parse a list of words in a pool of worker processes, in chunks of
+    chunksize words (by default a few per worker, never fewer than MIN_CHUNK).
+    The result is identical to parsing the words one after the other.
+    """
+    if chunksize is None:
+        chunksize = max(MIN_CHUNK, -(-len(words) // (workers * CHUNKS_PER_WORKER)))
+    if workers <= 1 or len(words) <= chunksize:
+        return parse_chunk(words)
+
+    chunks = [words[i:i+chunksize] for i in range(0, len(words), chunksize)]
+    # the workers parse with the convention of this process
+    with multiprocessing.Pool(min(workers, len(chunks)), initializer=use_convention, initargs=(CONVENTION,)) as pool:
+        parts = pool.map(parse_chunk, chunks, chunksize=1)
+
+    return ParsedGraphs.concat(parts)
+
+# header style pandas uses in to_excel, so the file looks the same as before
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+def cell_value(value):
+    # empty cells for missing values, plain python types for numpy ones
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+def export_rows(df, parsed, outpath):
+    """
+    write every word row of df followed by its graphs, with an empty row for
+    the annotation underneath, straight into a write-only workbook. Rows are
+    generated one at a time, so the interleaved sheet is never built in memory.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    width = int(parsed.lengths().max()) if len(parsed) else 0
+
+    header = []
+    for name in list(df.columns) + [f"Token_{i}" for i in range(width)]:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        header.append(cell)
+    ws.append(header)
+
+    graphs = parsed.graphs.tolist()
+    ids = parsed.ids.tolist()
+    offsets = parsed.offsets.tolist()
+    for i, row in enumerate(df.itertuples(index=False, name=None)):
+        ws.append([cell_value(value) for value in row] + [graphs[j] for j in ids[offsets[i]:offsets[i+1]]])
+        ws.append([])
+    wb.save(outpath)
 
 def main():
     # intialise arguments 
     args = input_parse()
+    use_convention(args.convention)
 
     # define paths
     datapath = os.path.join("data", "2_segmented_wordlists", args.filename)
     df = pd.read_excel(datapath)
-    df = df.dropna()
-
-    # apply parse function
-    df["ParsedTokens"] = df['Token'].apply(parse)
+    # keep the rows numbered from 0 so they line up with the parsed graphs
+    df = df.dropna().reset_index(drop=True)
 
-    # make a wide dataframe
+    # apply parse function, through the cache unless asked not to
+    if args.no_cache:
+        parsed = parse_parallel(df['Token'].to_list(), args.workers)
+    else:
+        cache = ParseCache(maxsize=args.cache_size)
+        parsed = ParsedGraphs.from_lists(cache.parse_many(df['Token'].to_list(), args.workers))
+        print(f"\n[INFO]: Parse cache: {cache.report()}\n")
     print(df)
-    print(range(df["ParsedTokens"].apply(len).max()))
-    wide_df = pd.DataFrame(df["ParsedTokens"].to_list(), columns=[f"Token_{i}" for i in range(df["ParsedTokens"].apply(len).max())])
-
-    # make result df
-    result_df = pd.concat([df, wide_df], axis=1)
-
-    # add empty rows
-    ordered_results = Add_Empty_Values(result_df)
-
-    # remove the ParsedTokens column
-    col_remove = "ParsedTokens"
-
-    fin_df = ordered_results.drop(col_remove, axis=1)
 
     outpath = os.path.join("data", "3_parsed_segmented", f"segmented_{args.filename}")
-    #save to excel format
-    fin_df.to_excel(outpath, index=False)
+    #save to excel format, with an empty row under every word
+    export_rows(df, parsed, outpath)
+    # and the graphs in compact form, for code that reads them back in
+    parsed.save(os.path.splitext(outpath)[0] + ".npz")
     print(f"\n[INFO]: The word parser results has been saved to {outpath}\n")
     
 
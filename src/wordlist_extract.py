@@ -2,35 +2,73 @@
 import os
 import re
 import string
+import pickle
+import hashlib
+import zipfile
 import argparse
+import multiprocessing
+import xml.etree.ElementTree as ET
+import numpy as np
+from array import array
+from functools import partial
 from collections import Counter, OrderedDict
 from docx import Document
 import pandas as pd
 
+# WordprocessingML tags used by the streaming reader
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = W_NS + "body"
+W_P = W_NS + "p"
+W_R = W_NS + "r"
+W_HYPERLINK = W_NS + "hyperlink"
+W_RUN_TEXT = {W_NS + "t": None, 
+              W_NS + "tab": "\t", 
+              W_NS + "ptab": "\t", 
+              W_NS + "cr": "\n", 
+              W_NS + "noBreakHyphen": "-"}
+
 def input_parse():
     # Define argparse to get input, output paths
     parser = argparse.ArgumentParser(description="Creates wordlists from full texts.")
-    parser.add_argument("-f", 
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-f", 
                         "--filename", 
-                        required=True, 
                         help="Input filename")
+    source.add_argument("-c",
+                        "--corpus",
+                        help="Folder of .docx files to process together")
+    parser.add_argument("-s",
+                        "--stream",
+                        action="store_true",
+                        help="Read the .docx incrementally instead of loading the whole document")
+    parser.add_argument("-i",
+                        "--incremental",
+                        action="store_true",
+                        help="Reuse cached counts for the parts of the document that did not change")
+    parser.add_argument("-x",
+                        "--index",
+                        action="store_true",
+                        help="Also save a positional index of the tokens for concordance.py")
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        default=os.cpu_count(),
+                        help="Number of processes used in corpus mode")
     args = parser.parse_args()
+    if args.index and args.incremental:
+        # the index needs every position in the text, the cache only keeps counts per segment
+        parser.error("--index reads the whole document and cannot be combined with --incremental")
     
     return args
 
+# punctuation removed from every token by cleanup
+CLEANUP_TABLE = str.maketrans("", "", ".,:;?!/><")
+
 def cleanup(s):
     """
     remove punctuation before counting
     """
-    s = s.replace(".", "")
-    s = s.replace(",", "")
-    s = s.replace(":", "")
-    s = s.replace(";", "")
-    s = s.replace("?", "")
-    s = s.replace("!", "")
-    s = s.replace("/", "")
-    s = s.replace(">", "")
-    s = s.replace("<", "")
+    s = s.translate(CLEANUP_TABLE)
     s = s.replace("- ", "")
     s = s.rstrip()
     
@@ -50,49 +88,90 @@ def paren(s):
     
     return s
 
-def ugly_regex(raw_text):
+def page_hyphen(m):
+    # page number inside a word becomes a hyphen, same as (\w)\[\-?\d+\] -> \1-
+    before = m.string[m.start() - 1] if m.start() else ""
+    if before.isalnum() or before == "_":
+        return "-"
+
+    return m.group()
+
+# replacements for the transform rule
+TRANSFORMS = {"__": "#####", "_": "####", "|": "###"}
+
+def transform(m):
+    return TRANSFORMS.get(m.group(), "##")
+
+# regex matching according to instructions, applied in order. Each rule is
+# (pattern, replacement, opener, triggers): opener is the opening character of
+# rules that match a span of text, and a rule is skipped when none of its
+# trigger strings occur in the text.
+UGLY_RULES = [
+    (re.compile(r'  '), ' ', None, ("  ",)),
+    (re.compile(r'\^.*?^}\s?'), '', None, ("^",)),                 # braces
+    (re.compile(r'\<.+?\>'), '', "<", ("<",)),                      # square brackets
+    (re.compile(r'\{.*?\}\s?'), '', "{", ("{",)),                   # braces
+    (re.compile(r'\[\-?\d+\]'), page_hyphen, None, ("[",)),         # hypens + page
+    (re.compile(r'\- '), '', None, ("- ",)),                        # hyphens + page 2
+    (re.compile(r'\[.*?\]'), '', "[", ("[",)),                      # page numbers
+    (re.compile(r'[.:;!]\s?'), ' ', None, (".", ":", ";", "!")),    # punctuation
+    (re.compile(r'__?|\||=\s?'), transform, None, ("_", "|", "=")), # transforms
+]
+
+def ugly_regex(raw_text, rules=UGLY_RULES):
     # regex matching according to instructions
-    raw_text = re.sub(r'  ', ' ', raw_text)
-    raw_text = re.sub(r'\^.*?^}\s?', '', raw_text)      # braces
-    raw_text = re.sub(r'\<.+?\>', '', raw_text)         # square brackets
-    raw_text = re.sub(r'\{.*?\}\s?', '', raw_text)      # braces
-    raw_text = re.sub(r'(\w)\[\-\d+\]', r'\1-', raw_text)  # hypens + page
-    raw_text = re.sub(r'(\w)\[\d+\]', r'\1-', raw_text)  # hypens + page
-    raw_text = re.sub(r'\- ', '', raw_text)            # hyphens + page 2
-    raw_text = re.sub(r'\[.*?\]', '', raw_text)         # page numbers
-    raw_text = re.sub(r'\.\s?|\:\s?|\;\s?|\:\s?|\!\s?', ' ', raw_text) # punctuation
-    raw_text = re.sub(r'\_\_', '#####', raw_text)       # transforms
-    raw_text = re.sub(r'\_', '####', raw_text)          # transforms
-    raw_text = re.sub(r'\|', '###', raw_text)           # transforms
-    raw_text = re.sub(r'\=\s?', '##', raw_text)            # transforms
+    for pattern, repl, opener, triggers in rules:
+        if any(t in raw_text for t in triggers):
+            raw_text = pattern.sub(repl, raw_text)
 
     return raw_text
 
-def doc_process(doc):
-    # fix words over line breaks
-    raw_text = ""
-    for i in doc.paragraphs:
-        if i.text == "":
+def regex_chunk(text, rules=UGLY_RULES):
+    """
+    ugly_regex for one chunk of a longer text. Returns None if a rule could
+    still match across the end of the chunk, so the caller should read on.
+    """
+    for pattern, repl, opener, triggers in rules:
+        if not any(t in text for t in triggers):
+            continue
+        if opener is not None:
+            # spans stop at newlines, so only an opener after the last one can be left open
+            start = text.rfind(opener)
+            if start > text.rfind("\n") and opener in pattern.sub(repl, text[start:]):
+                return None
+        text = pattern.sub(repl, text)
+    # the last token must be finished, otherwise it joins the next chunk
+    if text and not text[-1].isspace():
+        return None
+
+    return text
+
+def join_lines(lines):
+    """
+    fix words over line breaks, yielding one piece of raw text per paragraph
+    """
+    for line in lines:
+        if line == "":
             pass
+        elif line[-1] == "-":
+            yield line[:-1]
         else:
-            line = i.text
-            if line[-1]=="-":
-                raw_text += line[:-1]
-            else:
-                raw_text += line + " "
-    regexed_text = ugly_regex(raw_text)
-    # create list of all tokens
-    tokens = regexed_text.split()
-    cleaned = []
-    for token in tokens:
+            yield line + " "
+
+def count_tokens(regexed_text, wordcounts):
+    """
+    add the tokens of regexed_text to wordcounts. Tokens are counted as they
+    are first, so cleanup and paren only run once per distinct token.
+    """
+    for token, count in Counter(regexed_text.split()).items():
         if len(token)==1 and token.isalnum() == False:
             pass
         else:
-            token = cleanup(token)
-            token = paren(token)
-            cleaned.append(token)
-    # count tokens
-    wordcounts = Counter(cleaned)
+            wordcounts[paren(cleanup(token))] += count
+
+    return wordcounts
+
+def sort_counts(wordcounts):
     # created sorted dic & final cleanup 
     sortedDict = dict( sorted(wordcounts.items(), key=lambda x: x[0].lower()) )
 
@@ -106,22 +185,288 @@ def doc_process(doc):
 
     return tups
 
-def main():
-    args = input_parse()
+def doc_counts(doc):
+    raw_text = "".join(join_lines(i.text for i in doc.paragraphs))
+    regexed_text = ugly_regex(raw_text)
+    # count tokens
+    wordcounts = count_tokens(regexed_text, Counter())
 
-    inpath = os.path.join("data", "0_raw_data", args.filename)
-    #loading in the files
-    doc = Document(inpath)
-    tups = doc_process(doc)
+    return wordcounts
+
+def doc_process(doc):
+    return sort_counts(doc_counts(doc))
+
+def iter_paragraphs(path):
+    """
+    yield the text of each body paragraph of a .docx, same as doc.paragraphs,
+    by streaming word/document.xml out of the zip instead of building the DOM
+    """
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as xml:
+        stack = []
+        parts = []
+        body = None
+        for event, elem in ET.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                stack.append(elem.tag)
+                if len(stack) == 2 and elem.tag == W_BODY:
+                    body = elem
+                continue
+
+            depth = len(stack)
+            if depth > 2 and stack[1] == W_BODY and stack[2] == W_P:
+                # run content directly under the paragraph or inside a hyperlink
+                in_run = ((depth == 5 and stack[3] == W_R) or
+                          (depth == 6 and stack[3] == W_HYPERLINK and stack[4] == W_R))
+                if in_run and elem.tag in W_RUN_TEXT:
+                    parts.append(W_RUN_TEXT[elem.tag] or elem.text or "")
+                elif in_run and elem.tag == W_NS + "br":
+                    # only plain line breaks count, page/column breaks are dropped
+                    if elem.get(W_NS + "type", "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                elif depth == 3:
+                    yield "".join(parts)
+                    parts = []
+            if depth == 3 and body is not None:
+                # drop finished top-level elements so memory stays flat
+                body.clear()
+            stack.pop()
+
+def stream_segments(path, chunk_size=1 << 16):
+    """
+    yield (paragraph number, regexed text) for consecutive chunks of a .docx,
+    each cut where no rule of ugly_regex can match across the cut. The
+    paragraph number is that of the first paragraph in the chunk.
+    """
+    buffer = []
+    size = 0
+    limit = chunk_size
+    start = 0
+    for number, line in enumerate(iter_paragraphs(path)):
+        if not buffer:
+            start = number
+        for piece in join_lines([line]):
+            buffer.append(piece)
+            size += len(piece)
+        if buffer and size >= limit:
+            regexed_text = regex_chunk("".join(buffer))
+            if regexed_text is not None:
+                yield start, regexed_text
+                buffer = []
+                size = 0
+                limit = chunk_size
+            else:
+                # a span is still open, try again after another chunk
+                limit = size + chunk_size
+    yield start, ugly_regex("".join(buffer))
+
+def stream_counts(path, chunk_size=1 << 16):
+    """
+    streaming version of doc_counts, counting tokens chunk by chunk so peak
+    memory depends on chunk_size and vocabulary rather than document size
+    """
+    wordcounts = Counter()
+    for number, regexed_text in stream_segments(path, chunk_size):
+        count_tokens(regexed_text, wordcounts)
+
+    return wordcounts
+
+def stream_process(path, chunk_size=1 << 16):
+    return sort_counts(stream_counts(path, chunk_size))
+
+def rules_version(rules=UGLY_RULES):
+    # fingerprint of the normalisation rules, so counts cached under older rules are not reused
+    spec = [(p.pattern, getattr(r, "__name__", r), o, t) for p, r, o, t in rules]
+
+    return hashlib.sha1(repr((spec, sorted(CLEANUP_TABLE.items()))).encode()).hexdigest()
+
+def cache_path(filename):
+    # the segment cache of a document lives next to its wordlist
+    return os.path.join("data", "1_wordlists", "cache", filename.split(".")[0]+".pickle")
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        cache = pickle.load(f)
+    if cache.get("version") != rules_version():
+        return {}
+
+    return cache["segments"]
+
+def save_cache(path, segments):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump({"version": rules_version(), "segments": segments}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def incremental_counts(path, cache_file, chunk_size=1 << 10):
+    """
+    token counts of a .docx that only re-tokenises text which changed since
+    the last run. The document is cut into segments at safe points as in
+    stream_counts, after every paragraph unless a span is left open, and the
+    counts of each segment are cached under the hash of its raw text.
+    """
+    cache = load_cache(cache_file)
+    used = {}
+    wordcounts = Counter()
+    buffer = []
+    size = 0
+    limit = 0
+    digest = hashlib.blake2b(digest_size=16)
+    for piece in join_lines(iter_paragraphs(path)):
+        buffer.append(piece)
+        size += len(piece)
+        digest.update(piece.encode())
+        key = digest.digest()
+        if key in cache:
+            counts = cache[key]
+        elif size < limit:
+            # a long span was still open, look again after another chunk
+            continue
+        else:
+            regexed_text = regex_chunk("".join(buffer))
+            counts = None if regexed_text is None else count_tokens(regexed_text, Counter())
+        used[key] = counts
+        if counts is None:
+            # a span is still open, the segment goes on into the next paragraphs.
+            # short segments are cut at the first safe paragraph, so they stay the
+            # same around an edit, long ones are only looked at every chunk
+            if size >= chunk_size:
+                limit = size + chunk_size
+            continue
+        wordcounts.update(counts)
+        buffer = []
+        size = 0
+        limit = 0
+        digest = hashlib.blake2b(digest_size=16)
+
+    if buffer:
+        # whatever is left at the end of the document, marked so it is never
+        # mistaken for a segment that ends at a safe point
+        digest.update(b"\0")
+        key = digest.digest()
+        counts = cache.get(key)
+        if counts is None:
+            counts = count_tokens(ugly_regex("".join(buffer)), Counter())
+        used[key] = counts
+        wordcounts.update(counts)
+
+    # only keep the segments of the current version of the document
+    if used.keys() != cache.keys():
+        save_cache(cache_file, used)
+
+    return wordcounts
+
+def index_path(filename):
+    # the positional index of a document lives next to its wordlist
+    return os.path.join("data", "1_wordlists", "index", filename.split(".")[0]+".npz")
+
+def index_counts(path, index_file):
+    """
+    token counts of a .docx that also saves a positional index of the text:
+    the token at every position (as an id into vocab), the paragraph it is
+    in, and for every token id the list of its positions in CSR form
+    (positions[offsets[i]:offsets[i+1]]).
+    """
+    vocab = {}
+    tokens = array("i")
+    paragraphs = array("i")
+    # paragraph granularity, so positions point at the paragraph they came from
+    for number, regexed_text in stream_segments(path, chunk_size=1):
+        for token in regexed_text.split():
+            if len(token)==1 and token.isalnum() == False:
+                pass
+            else:
+                tokens.append(vocab.setdefault(paren(cleanup(token)), len(vocab)))
+                paragraphs.append(number)
+
+    tokens = np.frombuffer(tokens, dtype=np.int32)
+    frequencies = np.bincount(tokens, minlength=len(vocab))
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    np.savez_compressed(index_file,
+                        vocab=np.array(list(vocab), dtype=str),
+                        tokens=tokens,
+                        paragraphs=np.frombuffer(paragraphs, dtype=np.int32),
+                        positions=np.argsort(tokens, kind="stable").astype(np.int32),
+                        offsets=np.concatenate([[0], np.cumsum(frequencies)]).astype(np.int64))
+
+    return Counter(dict(zip(vocab, frequencies.tolist())))
+
+def file_counts(path, stream=False, incremental=False, index=False):
+    # token counts of one .docx, run in the worker processes in corpus mode
+    if index:
+        return index_counts(path, index_path(os.path.basename(path)))
+    if incremental:
+        return incremental_counts(path, cache_path(os.path.basename(path)))
+    if stream:
+        return stream_counts(path)
+
+    return doc_counts(Document(path))
+
+def merge_counts(names, counts):
+    """
+    reduce step of corpus mode: one row per token with the total frequency
+    and one frequency column per document
+    """
+    total = Counter()
+    for wordcounts in counts:
+        total.update(wordcounts)
+    tups = [tup for tup in sort_counts(total) if tup[0] != ""]
+
+    df = pd.DataFrame(tups, columns=["Token", "Frequency"])
+    for name, wordcounts in zip(names, counts):
+        df[f"Frequency_{name}"] = [wordcounts.get(token, 0) for token in df["Token"]]
+    df["Label"] = ""
+    df["Translation"] = ""
+
+    return df
+
+def save_wordlist(tups, filename):
     df = pd.DataFrame(tups, columns=["Token", "Frequency"])
     df = df[df["Token"] != ""]
     df["Label"] = ""
     df["Translation"] = ""
     #save them to excel
-    final_df = df.sort_values(by=["Token"], key=lambda x: x.str.lower(), ascending=True)
-    outfile = args.filename.split(".")[0]+".xlsx"
+    outfile = filename.split(".")[0]+".xlsx"
     outpath = os.path.join("data", "1_wordlists", f"wordlist_{outfile}")
     df.to_excel(outpath, index=False)
+
+    return outpath
+
+def corpus_process(corpus, stream=False, workers=None, incremental=False, index=False):
+    """
+    map every .docx in the corpus folder to its token counts in a process
+    pool, then write one wordlist per document and a merged corpus wordlist
+    """
+    indir = os.path.join("data", "0_raw_data", corpus)
+    filenames = sorted(f for f in os.listdir(indir) if f.endswith(".docx") and not f.startswith("~$"))
+    paths = [os.path.join(indir, f) for f in filenames]
+
+    with multiprocessing.Pool(workers) as pool:
+        counts = pool.map(partial(file_counts, stream=stream, incremental=incremental, index=index), paths, chunksize=1)
+
+    for filename, wordcounts in zip(filenames, counts):
+        outpath = save_wordlist(sort_counts(wordcounts), filename)
+        print(f"[INFO]: The tokenized wordlist results has been saved to: {outpath}")
+
+    names = [f.split(".")[0] for f in filenames]
+    df = merge_counts(names, counts)
+    outpath = os.path.join("data", "1_wordlists", f"corpus_{os.path.basename(os.path.normpath(corpus))}.xlsx")
+    df.to_excel(outpath, index=False)
+
+    return outpath
+
+def main():
+    args = input_parse()
+
+    if args.corpus:
+        outpath = corpus_process(args.corpus, args.stream, args.workers, args.incremental, args.index)
+        print(f"\n[INFO]: The merged corpus wordlist has been saved to: {outpath}\n")
+        return
+
+    inpath = os.path.join("data", "0_raw_data", args.filename)
+    #loading in the files
+    tups = sort_counts(file_counts(inpath, args.stream, args.incremental, args.index))
+    outpath = save_wordlist(tups, args.filename)
     print(f"\n[INFO]: The tokenized wordlist results has been saved to: {outpath}\n")
 
 
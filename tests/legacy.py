@@ -0,0 +1,315 @@
+"""
+the original code of the optimised pipeline stages, copied from the
+scripts as they were before, so the tests have a fixed reference to compare
+the new code with. src/benchmark.py times the new code against it.
+"""
+import re
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+# wordlist_extract
+def legacy_cleanup(s):
+    s = s.replace(".", "")
+    s = s.replace(",", "")
+    s = s.replace(":", "")
+    s = s.replace(";", "")
+    s = s.replace("?", "")
+    s = s.replace("!", "")
+    s = s.replace("/", "")
+    s = s.replace(">", "")
+    s = s.replace("<", "")
+    s = s.replace("- ", "")
+    s = s.rstrip()
+
+    return s
+
+def legacy_paren(s):
+    if "(" in s:
+        if ")" in s:
+            pass
+        else:
+            s = s.replace("(", "")
+    if ")" in s:
+        if "(" in s:
+            pass
+        else:
+            s = s.replace(")", "")
+
+    return s
+
+def legacy_ugly_regex(raw_text):
+    raw_text = re.sub(r'  ', ' ', raw_text)
+    raw_text = re.sub(r'\^.*?^}\s?', '', raw_text)
+    raw_text = re.sub(r'\<.+?\>', '', raw_text)
+    raw_text = re.sub(r'\{.*?\}\s?', '', raw_text)
+    raw_text = re.sub(r'(\w)\[\-\d+\]', r'\1-', raw_text)
+    raw_text = re.sub(r'(\w)\[\d+\]', r'\1-', raw_text)
+    raw_text = re.sub(r'\- ', '', raw_text)
+    raw_text = re.sub(r'\[.*?\]', '', raw_text)
+    raw_text = re.sub(r'\.\s?|\:\s?|\;\s?|\:\s?|\!\s?', ' ', raw_text)
+    raw_text = re.sub(r'\_\_', '#####', raw_text)
+    raw_text = re.sub(r'\_', '####', raw_text)
+    raw_text = re.sub(r'\|', '###', raw_text)
+    raw_text = re.sub(r'\=\s?', '##', raw_text)
+
+    return raw_text
+
+def legacy_wordlist(raw_text):
+    tokens = legacy_ugly_regex(raw_text).split()
+    cleaned = []
+    for token in tokens:
+        if len(token)==1 and token.isalnum() == False:
+            pass
+        else:
+            cleaned.append(legacy_paren(legacy_cleanup(token)))
+
+    wordcounts = Counter(cleaned)
+    sortedDict = dict( sorted(wordcounts.items(), key=lambda x: x[0].lower()) )
+
+    tups = []
+    for k,v in sortedDict.items():
+        if any(i.isdigit() for i in k):
+            pass
+        else:
+            tup = (k,v)
+            tups.append(tup)
+
+    return tups
+
+# word_parser
+def legacy_parse(s):
+    tokens = []
+    current = 0
+    token_start = -1
+    vowels = ["a", "ä", "æ", "e", "i", "o", "ö", "ø", "u", "ü", "y",
+              "A", "Ä", "Æ", "E", "I", "O", "Ö", "Ø", "U", "Ü", "Y"]
+
+    while current < len(s):
+        if s[current] == ":":
+            if (token_start != -1) and (s[token_start] == ":"):
+                tokens.append(s[token_start : current + 1])
+                token_start = -1
+            elif token_start == -1:
+                token_start = current
+        elif s[current] == "|":
+            if (token_start != -1) and (s[token_start] == "|"):
+                tokens.append(s[token_start : current + 1])
+                token_start = -1
+            elif token_start == -1:
+                token_start = current
+        elif s[current] == "!":
+            if (token_start != -1) and (s[token_start] == "!"):
+                tokens.append(s[token_start : current + 1])
+                token_start = -1
+            elif token_start == -1:
+                token_start = current
+        elif s[current] == "<":
+            token_start = current
+        elif s[current] == ">":
+            tokens.append(s[token_start : current + 1])
+            token_start = -1
+        elif s[current] == "[":
+            next_index = current + 1
+            while next_index < len(s) and s[next_index] != "]":
+                next_index += 1
+            tokens.append(s[current:next_index + 1])
+            current = next_index
+        elif s[current] == "(":
+            token_start = current
+        elif s[current] == ")":
+            tokens.append(s[token_start : current + 1])
+            token_start = -1
+        elif s[current] == "#":
+            next_index = current + 1
+            while next_index < len(s) and s[next_index] == "#":
+                next_index += 1
+            tokens.append(s[current:next_index])
+            current = next_index - 1
+        elif s[current] == "*":
+            next_index = current + 1
+            while next_index < len(s) and s[next_index] != "*":
+                next_index += 1
+            tokens.append(s[current:next_index + 1])
+            current = next_index
+        elif token_start == -1:
+            special_strings = ["‖i‖", "‖y‖", "‖u‖", "‖j‖", "‖v‖", "‖w‖",
+                               "‖I‖", "‖Y‖", "‖U‖", "‖J‖", "‖V‖", "‖W‖"]
+            for string in special_strings:
+                if s.startswith(string, current):
+                    tokens.append(string)
+                    current += len(string) - 1
+                    token_start = -1
+                    break
+            else:
+                if (
+                    current < len(s) - 1
+                    and s[current] in vowels
+                    and (s[current + 1] in vowels or s[current + 1] in {"h", "j"})
+                ):
+                    tokens.append(s[current])
+                    next_index = current + 1
+                    while (
+                        next_index < len(s)
+                        and (s[next_index] in {"h", "j"} or s[next_index] in vowels)
+                    ):
+                        tokens[-1] += s[next_index]
+                        next_index += 1
+                    current = next_index - 1
+                else:
+                    tokens.append(s[current])
+        current += 1
+
+    return tokens
+
+def legacy_export(df, parsed, outpath):
+    parsed_tokens = [parsed.word(i) for i in range(len(parsed))]
+    width = max(map(len, parsed_tokens))
+    wide_df = pd.DataFrame(parsed_tokens, columns=[f"Token_{i}" for i in range(width)])
+    result_df = pd.concat([df, wide_df], axis=1)
+    empty_values = np.full_like(result_df.values, np.nan)
+    data = np.hstack([result_df.values, empty_values]).reshape(-1, result_df.shape[1])
+    pd.DataFrame(data, columns=result_df.columns).to_excel(outpath, index=False)
+
+# sound_position
+def legacy_cluster(df):
+    exclude_chars = ['#', '<de>', '<en>', '[ig]', 'h', 'l', 'v','|ß|','ü']
+    word_dict = {}
+    for i in range(0, len(df), 2):
+        word = ''.join([x for x in list(df.iloc[i,1:].values) if pd.notnull(x)])
+        frequency = df.iloc[i, 0]
+        sound_positions = []
+        for char in df.iloc[i + 1, 1:]:
+            if pd.notnull(char) and char not in exclude_chars:
+                sound_positions.append(char)
+        word_dict[word] = {'frequency': frequency, 'sound_positions': sound_positions}
+
+    result_list = []
+    for word, data in word_dict.items():
+        for sound_position in data['sound_positions']:
+            result_list.append({'sound_position': sound_position, 'word': word, 'frequency': data['frequency']})
+    result_df = pd.DataFrame(result_list, columns=['sound_position', 'word', 'frequency'])
+    result_df.sort_values(by='sound_position', inplace=True)
+
+    return result_df
+
+# vowels_plot and consonants_plot, with the graph lists they had
+LEGACY_VOWELS = [
+    "a","ä","â","à","á","å",
+    "e","ë","ê","è","é",
+    "i","ï","î","ì","í",
+    "o","ö","ô","ø","ò","ó",
+    "u","ü","û","ù","ú","ů",
+    "y","ÿ","ŷ","ỳ","ý",
+    "æ","œ","œ̂","œ̀","œ́",
+    "|j|","|j̈|","|ĵ|","|j́|",
+    "|v|","|v̈|","|v̂|","|v̀|","|v́|","|v̊|",
+    "|w|","|ẅ|","|ŵ|","|ẁ|","|ẃ|","|ẘ|",
+    "(i)","(ï)","(î)","(ì)","(í)",
+    "(y)","(ÿ)","(ŷ)","(ỳ)","(ý)",
+    "(j)","(j̈)","(ĵ)","(j́)",
+    "(u)","(ü)","(û)","(ù)","(ú)","(ů)",
+    "(v)","(v̈)","(v̂)","(v̀)","(v́)","(v̊)",
+    "(w)","(ẅ)","(ŵ)","(ẁ)","(ẃ)","(ẘ)"
+]
+
+LEGACY_CONSONANTS = ["b", "c", "d", "f",
+                     "g", "h", "j", "k",
+                     "l", "m" , "n", "p" ,
+                     "q", "r", "s", "ß" , "ſ" ,
+                     "t", "v", "w", "x" , "z" ,
+                     "þ", "ð",
+                     "‖i‖", "‖y‖", "‖u‖", "‖ï‖" ,
+                     "‖î‖", "‖ì‖", "‖í‖", "‖ÿ‖",
+                     "‖ŷ‖", "‖ỳ‖", "‖ý‖", "‖ü‖" ,
+                     "‖û‖", "‖ù‖", "‖ú‖", "‖ů‖"]
+
+def legacy_vowels(df):
+    vowel_combinations = {}
+    escaped_vowels = [re.escape(v) for v in LEGACY_VOWELS]
+    single_vowel_pattern = "(?:" + "|".join(escaped_vowels) + ")h?"
+    grouped_vowel_pattern = "(?:" + "|".join(escaped_vowels) + "){2,}h?"
+    compiled_pattern = re.compile(grouped_vowel_pattern + "|" + single_vowel_pattern)
+    for index, row in df.iterrows():
+        word = row["Token"].lower()
+        frequency = row["Frequency"]
+        cleaned = re.sub(r'\*.*?\*', '', word)
+        cleaned = re.sub(r'\!.*?\!', '', cleaned)
+        if cleaned=="nan":
+            pass
+        else:
+            matches = compiled_pattern.findall(cleaned)
+            if matches:
+                for vowel_sequence in matches:
+                    if vowel_sequence in vowel_combinations:
+                        vowel_combinations[vowel_sequence] += frequency
+                    else:
+                        vowel_combinations[vowel_sequence] = frequency
+
+    return vowel_combinations
+
+def legacy_consonants(df):
+    consonant_combinations = {}
+    pattern = "|".join([re.escape(v) for v in LEGACY_CONSONANTS])
+    for index, row in df.iterrows():
+        word = row["Token"].lower()
+        frequency = row["Frequency"]
+        cleaned = re.sub(r'\*.*?\*', '', word)
+        cleaned = re.sub(r'\!.*?\!', '', cleaned)
+        if cleaned=="nan":
+            pass
+        else:
+            clusters = re.findall(r'\:(.*?)\:', cleaned)
+            if clusters:
+                for consonant_sequence in clusters:
+                    if consonant_sequence in consonant_combinations:
+                        consonant_combinations[consonant_sequence] += frequency
+                    else:
+                        consonant_combinations[consonant_sequence] = frequency
+            else:
+                consonants = re.findall(pattern, cleaned)
+                for consonant in consonants:
+                    if consonant in consonant_combinations:
+                        consonant_combinations[consonant] += frequency
+                    else:
+                        consonant_combinations[consonant] = frequency
+
+    return consonant_combinations
+
+def legacy_merge(d):
+    merged_dict = defaultdict(int)
+    for key, value in d.items():
+        merged_dict[re.sub(r'[^\w\s]', '', key)] += value
+
+    return dict(merged_dict)
+
+def legacy_counts(df):
+    # the tables the plots and sheets are made from
+    return legacy_merge(legacy_vowels(df)), legacy_merge(legacy_consonants(df))
+
+# plot_bar of the plotting scripts, given a plot as batch_plot.bar_job collects it
+def legacy_plot_bar(job):
+    labels, counts, column, title, outpath = job
+    plt.figure(figsize=(10, 6))
+    plt.bar(labels, counts, color='skyblue')
+    plt.xlabel(column)
+    plt.ylabel('Count')
+    plt.title(title)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(outpath)
+    plt.show()
+
+# leading_graph
+def legacy_transform(df, frequency_columns):
+    df = df.apply(lambda x: x.apply(lambda y: 0 if pd.isna(y) else y))
+    for column in frequency_columns:
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype(float)
+    for index, row in df.iterrows():
+        values = [row[column] for column in frequency_columns]
+        total_sum = sum(filter(pd.notna, values)) or 1
+        for column, value in zip(frequency_columns, values):
+            df.at[index, column] = value / total_sum
+
+    return df
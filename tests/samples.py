@@ -0,0 +1,76 @@
+"""
+synthetic input in the shape of every pipeline stage, used by the tests and
+by src/benchmark.py
+"""
+import random
+import numpy as np
+import pandas as pd
+import wordlist_extract
+
+# word forms and markup resembling a transcription
+SAMPLE_WORDS = ["wort", "hûs", "ſtat", "e(i)n", "vn|d", "de_r", "ki__nt", "gê=", "vn-",
+                "Got", "got", "vrowe", "mîn", "(abc", "def)", "ende.", "frage?", "rûf!",
+                "a:b", "ſpr;", "sla/sh", "12ab", "z", ".", ",", "wol,"]
+SAMPLE_MARKUP = ["{anm.}", "<de>", "[12]", "wor[13]", "x[-3]", "- ", "  ", "[fol. 2r]"]
+
+def synthetic_text(size, seed=0):
+    # random raw text in the shape join_lines produces
+    rng = random.Random(seed)
+    lines = []
+    line = []
+    for i in range(size):
+        line.append(rng.choice(SAMPLE_MARKUP if rng.random() < 0.05 else SAMPLE_WORDS))
+        if rng.random() < 0.1:
+            lines.append(" ".join(line))
+            line = []
+    lines.append(" ".join(line))
+
+    return "".join(wordlist_extract.join_lines(lines))
+
+SAMPLE_SEGMENTS = ["v", "r", "ou", "we", "g", "ê", ":ſt:", "|ß|", "!vn!", "<de>", "[ig]", "(i)", "##",
+                   "*got*", "‖w‖", "‖u‖", "ah", "ie", "uo", "ae", "b", "d", "t", "n", "hj", "Ei"]
+
+def synthetic_segmented(size, seed=0):
+    # random segmented word forms
+    rng = random.Random(seed)
+
+    return ["".join(rng.choice(SAMPLE_SEGMENTS) for i in range(rng.randint(2, 8))) for j in range(size)]
+
+# no graph here starts with another one followed by a combining mark, as œ̂ does:
+# the original patterns split those, the inventory matcher keeps them whole
+COUNT_SEGMENTS = SAMPLE_SEGMENTS + ["|j|", "(ů)", "ẘ", "ß", ":", "!", "*", "h", "e", "ſch", ":tz:", "‖ẅ‖"]
+
+def synthetic_wordlist(size, seed=0):
+    # a segmented wordlist as load_data returns it, with the odd empty cell
+    rng = random.Random(seed)
+    tokens = ["".join(rng.choice(COUNT_SEGMENTS) for i in range(rng.randint(1, 8))) if rng.random() < 0.98 else np.nan for j in range(size)]
+    df = pd.DataFrame({"Token": tokens, "Frequency": [rng.randint(1, 200) for j in range(size)]})
+    df["Token"] = df["Token"].astype(str).str.lower()
+
+    return df
+
+SAMPLE_POSITIONS = ["a", "ei", "ou", "e", "i", "uo", "b", "d", "g", "k", "s", "z", "#", "<de>", "[ig]", "h", "l", "v", "|ß|", "ü"]
+
+def synthetic_annotated(size, seed=0):
+    # an annotated sheet: a row of graphs with the frequency, then a row of sound positions
+    rng = random.Random(seed)
+    width = 10
+    rows = []
+    for i in range(size):
+        length = rng.randint(1, width)
+        graphs = [rng.choice(SAMPLE_SEGMENTS) for j in range(length)]
+        positions = [rng.choice(SAMPLE_POSITIONS) if rng.random() < 0.9 else np.nan for j in range(length)]
+        rows.append([rng.randint(1, 50)] + graphs + [np.nan] * (width - length))
+        rows.append([np.nan] + positions + [np.nan] * (width - length))
+
+    return pd.DataFrame(rows, columns=["Frequency"] + [f"Token_{i}" for i in range(width)])
+
+def synthetic_box(size, seed=0):
+    # a raw box: words, an empty morpheme type, and sparse allograph frequencies with the odd typo
+    rng = random.Random(seed)
+    columns = [f"frequency_{graph}" for graph in ["a", "ä", "e", "ei", "ai", "æ", "ey", "ej"]]
+    data = {"word": [rng.choice(SAMPLE_WORDS) for i in range(size)], "morpheme_type": [np.nan] * size}
+    for column in columns:
+        data[column] = [rng.choice([rng.randint(0, 80), rng.random() * 10, "x"]) if rng.random() < 0.3 else np.nan for i in range(size)]
+
+    return pd.DataFrame(data), columns
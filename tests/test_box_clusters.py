@@ -0,0 +1,147 @@
+import itertools
+import numpy as np
+import pytest
+import box_clusters
+
+METHODS = ["average", "complete", "single", "ward"]
+
+def cluster_distance(distances, points, method, a, b):
+    # the distance of two clusters from its definition, ward from the centroids of euclidean points
+    block = distances[np.ix_(a, b)]
+    if method == "single":
+        return block.min()
+    if method == "complete":
+        return block.max()
+    if method == "average":
+        return block.mean()
+
+    return np.sqrt(2 * len(a) * len(b) / (len(a) + len(b))) * np.linalg.norm(points[a].mean(axis=0) - points[b].mean(axis=0))
+
+def brute_force(distances, points, method):
+    # merge the closest two clusters, looking at every pair at every step, numbered as scipy does
+    n = len(distances)
+    clusters = {i: [i] for i in range(n)}
+    tree = []
+    while len(clusters) > 1:
+        a, b = min(itertools.combinations(sorted(clusters), 2),
+                   key=lambda pair: cluster_distance(distances, points, method, clusters[pair[0]], clusters[pair[1]]))
+        tree.append((a, b, cluster_distance(distances, points, method, clusters[a], clusters[b]), len(clusters[a]) + len(clusters[b])))
+        clusters[n + len(tree) - 1] = clusters.pop(a) + clusters.pop(b)
+
+    return np.array(tree)
+
+def is_closest_pair_every_step(tree, distances, points, method):
+    # on ties there is more than one tree, but every merge has to be of a closest pair at its step
+    n = len(distances)
+    clusters = {i: [i] for i in range(n)}
+    for step, (a, b, distance, size) in enumerate(tree):
+        a, b = int(a), int(b)
+        closest = min(cluster_distance(distances, points, method, clusters[x], clusters[y]) for x, y in itertools.combinations(clusters, 2))
+        if a >= b or size != len(clusters[a]) + len(clusters[b]):
+            return False
+        if not np.isclose(distance, closest) or not np.isclose(distance, cluster_distance(distances, points, method, clusters[a], clusters[b])):
+            return False
+        clusters[n + step] = clusters.pop(a) + clusters.pop(b)
+
+    return True
+
+def euclidean(points):
+    return np.sqrt(((points[:, None] - points[None]) ** 2).sum(axis=-1))
+
+def problem(rng, n, method, values=None):
+    # a distance matrix for the method, ward needs euclidean points
+    points = rng.integers(0, values, (n, 2)).astype(float) if values else rng.random((n, 3))
+    if method == "ward":
+        return euclidean(points), points
+    distances = np.triu(rng.integers(0, values, (n, n)).astype(float) if values else rng.random((n, n)), 1)
+
+    return distances + distances.T, points
+
+@pytest.mark.parametrize("method", METHODS)
+def test_linkage_equals_brute_force(method):
+    rng = np.random.default_rng(0)
+    for n in range(2, 12):
+        distances, points = problem(rng, n, method)
+
+        assert np.allclose(box_clusters.linkage(distances, method), brute_force(distances, points, method))
+
+@pytest.mark.parametrize("method", METHODS)
+def test_linkage_with_ties(method):
+    rng = np.random.default_rng(1)
+    for trial in range(200):
+        distances, points = problem(rng, int(rng.integers(2, 9)), method, values=3)
+
+        assert is_closest_pair_every_step(box_clusters.linkage(distances, method), distances, points, method)
+
+@pytest.mark.parametrize("method", METHODS)
+def test_linkage_with_tied_pairs(method):
+    # three pairs at the same distance, merged in the order of their first item
+    points = np.array([[0, 0], [0, 1], [5, 0], [5, 1], [0, 9], [0, 10]], dtype=float)
+    distances = euclidean(points)
+    tree = box_clusters.linkage(distances, method)
+
+    assert np.allclose(tree, brute_force(distances, points, method))
+    assert tree[:3, :2].tolist() == [[0, 1], [2, 3], [4, 5]]
+
+@pytest.mark.parametrize("method", METHODS)
+def test_linkage_of_two(method):
+    assert box_clusters.linkage(np.array([[0, 2.5], [2.5, 0]]), method).tolist() == [[0, 1, 2.5, 2]]
+
+def test_linkage_of_one():
+    with pytest.raises(ValueError):
+        box_clusters.linkage(np.zeros((1, 1)))
+
+def test_relabel():
+    # merges in the order the chain found them, each merged cluster in place of its second item
+    merges = [(2, 3, 1.0, 2), (0, 1, 0.5, 2), (1, 3, 2.0, 4)]
+
+    assert box_clusters.relabel(merges, 4).tolist() == [[0, 1, 0.5, 2], [2, 3, 1.0, 2], [4, 5, 2.0, 4]]
+
+def test_flat_clusters():
+    # 0 and 1 close together, 2 and 3 close together, 4 far from both
+    points = np.array([[0], [1], [10], [11], [30]], dtype=float)
+    tree = box_clusters.linkage(euclidean(points), "average")
+
+    assert box_clusters.flat_clusters(tree, 5, 1).tolist() == [1, 1, 1, 1, 1]
+    assert box_clusters.flat_clusters(tree, 5, 2).tolist() == [1, 1, 1, 1, 2]
+    assert box_clusters.flat_clusters(tree, 5, 3).tolist() == [1, 1, 2, 2, 3]
+    assert box_clusters.flat_clusters(tree, 5, 5).tolist() == [1, 2, 3, 4, 5]
+    assert box_clusters.flat_clusters(tree, 5, 9).tolist() == [1, 2, 3, 4, 5]
+
+def test_nearest():
+    rng = np.random.default_rng(2)
+    distances = euclidean(rng.random((12, 3)))
+    indices, values = box_clusters.nearest(distances, 4)
+    expected = np.argsort(np.where(np.eye(12, dtype=bool), np.inf, distances), axis=1)[:, :4]
+
+    assert indices.tolist() == expected.tolist()
+    assert np.array_equal(values, np.take_along_axis(distances, expected, axis=1))
+
+def test_nearest_k_out_of_range():
+    distances = euclidean(np.array([[0.0], [1.0], [3.0]]))
+
+    assert box_clusters.nearest(distances, 10)[0].tolist() == [[1, 2], [0, 2], [1, 0]]
+    assert box_clusters.nearest(distances, 0)[0].shape == (3, 0)
+
+def test_manuscript_distances():
+    # B shares box1 with A, C shares box2 with A, D shares nothing
+    names = ["A/box1.xlsx", "A/box2.xlsx", "B/box1.xlsx", "C/box2.xlsx", "C/box3.xlsx", "D/box4.xlsx"]
+    distances = np.array([[0, 9, 1, 9, 9, 9],
+                          [9, 0, 9, 3, 9, 9],
+                          [1, 9, 0, 9, 9, 9],
+                          [9, 3, 9, 0, 9, 9],
+                          [9, 9, 9, 9, 0, 9],
+                          [9, 9, 9, 9, 9, 0]], dtype=float)
+    labels, result = box_clusters.manuscript_distances(names, distances)
+
+    assert labels == ["A", "B", "C", "D"]
+    assert result.tolist() == [[0, 1, 3, 3],
+                               [1, 0, 3, 3],
+                               [3, 3, 0, 3],
+                               [3, 3, 3, 0]]
+
+def test_manuscript_distances_averages_common_boxes():
+    names = ["A/x.xlsx", "A/y.xlsx", "B/x.xlsx", "B/y.xlsx"]
+    distances = np.array([[0, 5, 2, 5], [5, 0, 5, 4], [2, 5, 0, 5], [5, 4, 5, 0]], dtype=float)
+
+    assert box_clusters.manuscript_distances(names, distances)[1].tolist() == [[0, 3], [3, 0]]
@@ -0,0 +1,92 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import draft_boxes
+import leading_graph
+import sound_position
+from test_sound_position import annotated
+
+# ei is written ei, ai or ey, ou is written ou or uo, and a occurs once
+n = np.nan
+SHEET = annotated([(10, ["w", "ei", "n"], [n, "ei", n]),
+                   (4, ["z", "ai", "t"], [n, "ei", n]),
+                   (4, ["b", "ey"], [n, "ei"]),
+                   (6, ["h", "ou", "s"], [n, "ou", n]),
+                   (2, ["h", "uo", "s"], [n, "ou", n]),
+                   (1, ["d", "a", "z"], [n, "a", n]),
+                   # ei twice in one word, written two ways
+                   (3, ["m", "ei", "n", "ai"], [n, "ei", n, "ei"]),
+                   (5, ["s", "ei", "n"], [n, "ei", n]),
+                   (5, ["d", "ei", "n"], [n, "ei", n])])
+
+def cube():
+    return draft_boxes.position_cube(sound_position.cluster_positions(SHEET, with_graphs=True))
+
+def test_position_cube():
+    result = cube()
+
+    # graphs in the order they are first found, sound positions sorted, words in the order they are found
+    assert list(result.columns) == ["ei", "ai", "ey", "ou", "uo", "a"]
+    assert list(result.index) == [("a", "daz"), ("ei", "wein"), ("ei", "zait"), ("ei", "bey"), ("ei", "meinai"),
+                                  ("ei", "sein"), ("ei", "dein"), ("ou", "hous"), ("ou", "huos")]
+    # a combination that does not occur is an empty cell
+    assert result.loc[("ei", "meinai")].fillna(0).tolist() == [3, 3, 0, 0, 0, 0]
+    assert result.loc["ou"].fillna(0).to_numpy().tolist() == [[0, 0, 0, 6, 0, 0], [0, 0, 0, 0, 2, 0]]
+    assert result.notna().sum().sum() == 10
+
+def test_draft_box():
+    box = draft_boxes.draft_box(cube(), "ei")
+
+    # allographs by overall frequency, words by frequency and then spelling
+    assert list(box.columns) == ["word", "morpheme_type", "frequency_ei", "frequency_ai", "frequency_ey"]
+    assert box["word"].tolist() == ["wein", "meinai", "dein", "sein", "bey", "zait"]
+    assert box["morpheme_type"].isna().all()
+    assert box.iloc[:, 2:].fillna(0).to_numpy().tolist() == [[10, 0, 0], [3, 3, 0], [5, 0, 0], [5, 0, 0], [0, 0, 4], [0, 4, 0]]
+
+def test_draft_box_leaves_out_other_graphs():
+    assert list(draft_boxes.draft_box(cube(), "ou").columns) == ["word", "morpheme_type", "frequency_ou", "frequency_uo"]
+
+def test_box_filename():
+    taken = set()
+
+    assert draft_boxes.box_filename("a/b", taken) == "a_b.xlsx"
+    assert draft_boxes.box_filename("A", taken) == "A.xlsx"
+    # file names are compared without case, as on Windows and macOS
+    assert draft_boxes.box_filename("a", taken) == "a_2.xlsx"
+    assert draft_boxes.box_filename("", taken) == "_.xlsx"
+
+def run(monkeypatch, *flags):
+    # main on the sheet, as saved in data/4_annotated_segmented with the columns it drops
+    sheet = SHEET.assign(Label=None, Translation=None, Notes=None)
+    os.makedirs(os.path.join("data", "4_annotated_segmented"), exist_ok=True)
+    sheet.to_excel(os.path.join("data", "4_annotated_segmented", "doc.xlsx"), index=False)
+    monkeypatch.setattr(sys, "argv", ["draft_boxes.py", "--filename", "doc.xlsx", *flags])
+    draft_boxes.main()
+
+    return sorted(os.listdir(os.path.join("data", "5_boxes_raw", "doc")))
+
+@pytest.mark.parametrize("flags, boxes", [
+    ([], ["a.xlsx", "ei.xlsx", "ou.xlsx"]),
+    # a occurs once, ou 8 times and ei 34 times, twice in meinai
+    (["--min_frequency", "2"], ["ei.xlsx", "ou.xlsx"]),
+    (["--min_frequency", "9"], ["ei.xlsx"]),
+])
+def test_min_frequency(flags, boxes, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    assert run(monkeypatch, *flags) == boxes
+
+def test_boxes_go_through_leading_graph(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run(monkeypatch)
+    raw = os.path.join("data", "5_boxes_raw", "doc")
+
+    # every word counts once, split over its graphs: ei has 1 + 0.5 + 1 + 1 of 6 words
+    assert leading_graph.process_box(os.path.join(raw, "ei.xlsx"), tmp_path / "ei.xlsx") == ("ei", pytest.approx(350 / 6))
+    assert leading_graph.process_box(os.path.join(raw, "ou.xlsx"), tmp_path / "ou.xlsx") == (None, 50.0)
+    box = pd.read_excel(tmp_path / "ei.xlsx")
+    assert list(box.columns) == ["word", "morpheme_type", "frequency_ei", "frequency_ai", "frequency_ey"]
+    assert box["word"].tolist()[:6] == ["wein", "meinai", "dein", "sein", "bey", "zait"]
+    assert box["frequency_ai"].tolist()[-2:] == [pytest.approx(1.5), pytest.approx(150 / 6)]
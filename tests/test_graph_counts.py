@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+import graph_counts
+import inventory
+from legacy import LEGACY_VOWELS, LEGACY_CONSONANTS, legacy_counts
+from samples import synthetic_wordlist
+
+def single_pass_counts(df):
+    return tuple(map(graph_counts.merge_counts, graph_counts.count_graphs(df)))
+
+def test_default_convention_is_the_original_lists():
+    assert inventory.convention("default").graphs("vowels") == LEGACY_VOWELS
+    assert inventory.convention("default").graphs("consonants") == LEGACY_CONSONANTS
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3000])
+def test_counts_equal_original(size):
+    # same graphs with the same totals, found in the same order
+    df = synthetic_wordlist(size, seed=size)
+    for new, legacy in zip(single_pass_counts(df), legacy_counts(df)):
+        assert list(new.items()) == list(legacy.items())
+
+@pytest.mark.parametrize("word, vowels, consonants", [
+    ("vrouwe", {"ou": 2, "e": 2}, {"v": 2, "r": 2, "w": 2}),
+    ("sch:tz:ah", {"ah": 2}, {"tz": 2}),
+    ("*got*!vn!aie", {"aie": 2}, {}),
+    ("(i)|j|e", {"(i)|j|e": 2}, {"j": 2}),
+    ("nan", {}, {}),
+])
+def test_count_graphs(word, vowels, consonants):
+    df = pd.DataFrame({"Token": [word], "Frequency": [2]})
+
+    assert graph_counts.count_graphs(df) == (vowels, consonants)
+
+def test_count_graphs_one_kind():
+    df = pd.DataFrame({"Token": ["vrouwe", "ouwe"], "Frequency": [2, 3]})
+
+    assert graph_counts.count_graphs(df, kinds=("consonants",)) == ({"v": 2, "r": 2, "w": 5},)
+
+def test_merge_counts_keeps_first_found_order():
+    assert list(graph_counts.merge_counts({"(i)": 1, "e": 2, "i": 3, "|j|": 4}).items()) == [("i", 4), ("e", 2), ("j", 4)]
@@ -0,0 +1,260 @@
+import os
+import itertools
+from fractions import Fraction
+import numpy as np
+import pandas as pd
+import pytest
+import graphematic
+import leading_graph
+
+def exact_l1(rows_a, rows_b):
+    # the l1 distance of the percentages of two boxes, in exact arithmetic on the decimals of the sheet
+    def percentages(rows):
+        sums = [sum(Fraction(repr(value)) for value in column) for column in zip(*rows)]
+        total = sum(sums)
+        return [100 * value / total if total else Fraction(0) for value in sums]
+
+    return sum(abs(a - b) for a, b in zip(percentages(rows_a), percentages(rows_b)))
+
+def exact_p_value(rows_a, rows_b):
+    # the share of all splits of the pooled words, keeping the box sizes, at least as far apart as the boxes
+    pooled = [list(map(float, row)) for row in np.concatenate([rows_a, rows_b])]
+    observed = exact_l1(pooled[:len(rows_a)], pooled[len(rows_a):])
+    splits = list(itertools.combinations(range(len(pooled)), len(rows_a)))
+    count = 0
+    for split in splits:
+        rest = [pooled[i] for i in range(len(pooled)) if i not in split]
+        count += exact_l1([pooled[i] for i in split], rest) >= observed
+
+    return count / len(splits)
+
+# word rows of tiny boxes, with many splits as far apart as the boxes themselves
+TINY_BOXES = [
+    (np.array([[1, 0], [1, 0], [0, 1]]), np.array([[0, 1], [0, 1], [1, 0], [0, 1]])),
+    (np.array([[2, 0, 1], [1, 1, 0]]), np.array([[0, 3, 0], [0, 1, 1], [1, 0, 0]])),
+    (np.array([[0.1, 0.2, 0.7], [0.3, 0.3, 0.4]]), np.array([[0.6, 0.2, 0.2], [0.1, 0.8, 0.1], [0.5, 0.25, 0.25]])),
+]
+
+@pytest.mark.parametrize("rows_a, rows_b", TINY_BOXES)
+def test_permutation_count_against_enumeration(rows_a, rows_b):
+    rows_a, rows_b = rows_a.astype(float), rows_b.astype(float)
+    permutations = 20000
+    count = graphematic.permutation_count(rows_a, rows_b, "l1", np.random.SeedSequence(0), permutations)
+
+    # within four standard errors of the exact share
+    assert abs(count / permutations - exact_p_value(rows_a, rows_b)) < 4 * np.sqrt(0.25 / permutations)
+
+def test_permutation_count_ties():
+    # the same word everywhere, every split is as far apart as the boxes, whatever the rounding of the sums
+    rows_a = np.tile([0.1, 0.7, 0.2], (3, 1))
+    rows_b = np.tile([0.1, 0.7, 0.2], (4, 1))
+    for metric in graphematic.METRICS:
+        assert graphematic.permutation_count(rows_a, rows_b, metric, np.random.SeedSequence(0), 500) == 500
+
+def test_permutation_count_empty_box():
+    rows_b = np.array([[1.0, 2.0], [0.0, 3.0]])
+
+    assert graphematic.permutation_count(np.zeros((0, 2)), rows_b, "l1", np.random.SeedSequence(0), 100) == 100
+
+def test_permutation_test_identical_boxes():
+    rows = np.array([[1.0, 0.0], [0.0, 1.0]])
+
+    assert graphematic.permutation_test([rows, rows.copy()], [(0, 1)], "l1", 99).tolist() == [1.0]
+
+def test_permutation_test_depends_on_seed_only(monkeypatch):
+    # several chunks per pair, so the pool has more than one task
+    monkeypatch.setattr(graphematic, "PERMUTATION_CHUNK", 70)
+    rng = np.random.default_rng(0)
+    word_rows = [rng.integers(0, 3, (size, 4)).astype(float) for size in [5, 8, 6]]
+    pairs = [(0, 1), (0, 2), (1, 2)]
+    serial = graphematic.permutation_test(word_rows, pairs, "hellinger", 300, workers=1, seed=3)
+    parallel = graphematic.permutation_test(word_rows, pairs, "hellinger", 300, workers=2, seed=3)
+
+    assert np.array_equal(serial, parallel)
+    assert not np.array_equal(serial, graphematic.permutation_test(word_rows, pairs, "hellinger", 300, workers=1, seed=4))
+
+def write_box(file_name, words, stamp):
+    # a box in data/6_boxes as leading_graph.py saves it, from the frequencies of its words, with a set modification time
+    df = pd.DataFrame({"word": [f"w{i}" for i in range(len(next(iter(words.values()))))]})
+    for graph, frequencies in words.items():
+        df[f"frequency_{graph}"] = frequencies
+    columns = [column for column in df.columns if column.startswith("frequency")]
+    path = os.path.join("data", "6_boxes", file_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    leading_graph.save_data(leading_graph.calculate_percentage(leading_graph.transform_data(df, columns), columns), path)
+    os.utime(path, ns=(stamp, stamp))
+
+def same_as_excel(store, input_names):
+    # the cached vectors and word rows against reading every box from Excel
+    graphemes, matrix = graphematic.box_matrix(input_names, store)
+    expected_graphemes, expected = graphematic.box_matrix(input_names)
+    word_rows = graphematic.box_word_rows(input_names, expected_graphemes, store)
+    expected_rows = graphematic.box_word_rows(input_names, expected_graphemes)
+
+    return (sorted(graphemes) == expected_graphemes
+            and np.array_equal(matrix[:, np.argsort(graphemes)], expected)
+            and all(np.array_equal(a, b) for a, b in zip(word_rows, expected_rows)))
+
+@pytest.fixture
+def boxes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_box("A/a.xlsx", {"a": [3, 0, 1], "e": [1, 2, 0]}, 10**18)
+    write_box("A/b.xlsx", {"a": [1, 1], "ei": [0, 2]}, 10**18)
+    write_box("B/a.xlsx", {"e": [2, 2, 2, 1]}, 10**18)
+
+    return ["A/a.xlsx", "A/b.xlsx", "B/a.xlsx"]
+
+def test_store_first_read(boxes):
+    store = graphematic.BoxStore()
+
+    assert same_as_excel(store, boxes)
+    assert store.read == 3
+    assert same_as_excel(graphematic.BoxStore(), boxes)
+
+def test_store_touched_box(boxes):
+    graphematic.BoxStore().refresh(boxes)
+    os.utime(os.path.join("data", "6_boxes", "A/a.xlsx"), ns=(2 * 10**18, 2 * 10**18))
+    store = graphematic.BoxStore()
+
+    assert same_as_excel(store, boxes)
+    # the contents are the same, so the box is not read again
+    assert store.read == 0
+
+def test_store_edited_box(boxes):
+    store = graphematic.BoxStore()
+    store.refresh(boxes)
+    write_box("A/b.xlsx", {"a": [1, 5], "ei": [4, 2]}, 2 * 10**18)
+
+    assert same_as_excel(store, boxes)
+    assert same_as_excel(graphematic.BoxStore(), boxes)
+    assert store.read == 4
+
+def test_store_deleted_box(boxes):
+    store = graphematic.BoxStore()
+    store.refresh(boxes)
+    os.remove(os.path.join("data", "6_boxes", "A/b.xlsx"))
+    reopened = graphematic.BoxStore()
+
+    assert same_as_excel(reopened, ["A/a.xlsx", "B/a.xlsx"])
+    assert list(reopened.boxes) == ["A/a.xlsx", "B/a.xlsx"]
+    # ei was only in the deleted box
+    assert sorted(reopened.graphemes) == ["frequency_a", "frequency_e"]
+    assert same_as_excel(store, ["A/a.xlsx", "B/a.xlsx"])
+
+def test_store_renamed_box(boxes):
+    graphematic.BoxStore().refresh(boxes)
+    os.rename(os.path.join("data", "6_boxes", "B/a.xlsx"), os.path.join("data", "6_boxes", "B/c.xlsx"))
+    store = graphematic.BoxStore()
+    renamed = ["A/a.xlsx", "A/b.xlsx", "B/c.xlsx"]
+
+    assert same_as_excel(store, renamed)
+    assert sorted(store.boxes) == renamed
+    assert same_as_excel(graphematic.BoxStore(), renamed)
+
+def test_store_new_grapheme(boxes):
+    store = graphematic.BoxStore()
+    store.refresh(boxes)
+    write_box("B/a.xlsx", {"e": [2, 2, 2, 1], "æ": [0, 1, 0, 3]}, 2 * 10**18)
+
+    assert same_as_excel(store, boxes)
+    assert "frequency_æ" in graphematic.BoxStore().graphemes
+    assert same_as_excel(graphematic.BoxStore(), boxes)
+    # a box not asked for is read the first time it is
+    write_box("C/d.xlsx", {"ä": [1]}, 10**18)
+    assert same_as_excel(store, boxes + ["C/d.xlsx"])
+
+# percentages of two boxes, one evenly split and one all first grapheme, and the distances between them
+HALF, FIRST = np.array([50.0, 50.0]), np.array([100.0, 0.0])
+KNOWN = {"l1": 100.0,
+         "total_variation": 0.5,
+         "hellinger": np.sqrt(1 - np.sqrt(0.5)),
+         "chi_square": 1 / 3,
+         "jensen_shannon": np.sqrt(1.5 - 0.75 * np.log2(3))}
+
+@pytest.mark.parametrize("metric", graphematic.METRICS)
+def test_metric_known_values(metric):
+    distances = graphematic.pairwise_distances(np.array([HALF, FIRST, [0.0, 100.0]]), metric)
+
+    assert np.isclose(distances[0, 1], KNOWN[metric])
+    assert np.allclose(np.diag(distances), 0)
+    # nothing in common
+    assert np.isclose(distances[1, 2], 200.0 if metric == "l1" else 1.0)
+
+@pytest.mark.parametrize("metric", graphematic.METRICS)
+def test_metric_symmetric_and_stacked(metric):
+    rng = np.random.default_rng(0)
+    stack = rng.random((3, 6, 5)) * (rng.random((3, 6, 5)) < 0.7)
+    distances = graphematic.pairwise_distances(stack, metric)
+
+    assert np.array_equal(distances, np.swapaxes(distances, 1, 2))
+    for i in range(3):
+        assert np.array_equal(distances[i], graphematic.pairwise_distances(stack[i], metric))
+
+@pytest.mark.parametrize("metric", graphematic.METRICS)
+def test_metric_blocks(metric, monkeypatch):
+    # one row compared at a time gives the same as all rows at once
+    rng = np.random.default_rng(1)
+    matrix = rng.random((9, 7)) * 100
+    stack = rng.random((2, 9, 7)) * 100
+    whole, whole_stack = graphematic.pairwise_distances(matrix, metric), graphematic.pairwise_distances(stack, metric)
+    monkeypatch.setattr(graphematic, "BLOCK_VALUES", 1)
+
+    assert np.array_equal(graphematic.pairwise_distances(matrix, metric), whole)
+    assert np.array_equal(graphematic.pairwise_distances(stack, metric), whole_stack)
+
+def test_l1_is_chained_total(boxes):
+    # the distance process_files gives for two boxes, in its Total row
+    os.makedirs("output")
+    graphematic.process_files(["A/a.xlsx", "A/b.xlsx"], os.path.join("output", "chained.xlsx"))
+    total = pd.read_excel(os.path.join("output", "chained.xlsx"))["distance"].iloc[-2]
+    graphemes, matrix = graphematic.box_matrix(["A/a.xlsx", "A/b.xlsx"])
+
+    assert np.isclose(graphematic.pairwise_distances(matrix, "l1")[0, 1], total)
+
+def test_bootstrap_depends_on_seed_only(monkeypatch):
+    # several chunks of replicates and of pairs, so both pools have more than one task
+    monkeypatch.setattr(graphematic, "BOOTSTRAP_CHUNK", 40)
+    monkeypatch.setattr(graphematic, "BLOCK_VALUES", 1000)
+    rng = np.random.default_rng(0)
+    word_rows = [rng.integers(0, 4, (size, 5)).astype(float) for size in [6, 3, 9, 4, 7]]
+    serial = graphematic.bootstrap(word_rows, "jensen_shannon", 130, 0.9, workers=1, seed=5)
+    parallel = graphematic.bootstrap(word_rows, "jensen_shannon", 130, 0.9, workers=2, seed=5)
+
+    assert serial[0].shape == (10,)
+    assert np.array_equal(serial[0], parallel[0]) and np.array_equal(serial[1], parallel[1])
+    assert np.all(serial[0] <= serial[1])
+    assert graphematic.REPLICATES is None
+
+def test_corpus_with_missing_boxes(boxes):
+    # A has sound positions a and b, B only a, C b and c: B and C have none in common
+    write_box("C/b.xlsx", {"a": [0, 2], "ei": [3, 1]}, 10**18)
+    write_box("C/c.xlsx", {"e": [1]}, 10**18)
+    positions, graphemes, tensor, mask, input_names = graphematic.corpus_tensor(["A", "B", "C"])
+
+    assert positions == ["a", "b", "c"]
+    assert mask.tolist() == [[True, True, False], [True, False, False], [False, True, True]]
+    assert input_names == ["A/a.xlsx", "A/b.xlsx", "B/a.xlsx", "C/b.xlsx", "C/c.xlsx"]
+
+    distances, aggregate, shared = graphematic.corpus_distances(tensor, mask, "l1")
+    pair_a = graphematic.pairwise_distances(graphematic.box_matrix(["A/a.xlsx", "B/a.xlsx"])[1])[0, 1]
+    pair_b = graphematic.pairwise_distances(graphematic.box_matrix(["A/b.xlsx", "C/b.xlsx"])[1])[0, 1]
+
+    assert shared.tolist() == [[2, 1, 1], [1, 1, 0], [1, 0, 2]]
+    assert np.isclose(distances[0, 0, 1], pair_a) and np.isnan(distances[0, 0, 2]) and np.isnan(distances[0, 2, 2])
+    assert np.isclose(distances[1, 0, 2], pair_b) and np.isnan(distances[1, 1, 1])
+    assert np.isnan(distances[2, 0, 2]) and distances[2, 2, 2] == 0
+    assert np.allclose(aggregate[[0, 0, 0, 1], [0, 1, 2, 1]], [0, pair_a, pair_b, 0])
+    assert np.isnan(aggregate[1, 2]) and np.isnan(aggregate[2, 1])
+
+@pytest.mark.parametrize("metric", graphematic.METRICS)
+def test_corpus_chunks(metric):
+    # one sound position at a time gives the same as all of them at once
+    rng = np.random.default_rng(2)
+    tensor = rng.random((4, 7, 5)) * 100
+    mask = rng.random((4, 7)) < 0.7
+    tensor[~mask] = 0
+    whole = graphematic.corpus_distances(tensor, mask, metric)
+    chunked = graphematic.corpus_distances(tensor, mask, metric, chunk=1)
+
+    for a, b in zip(whole, chunked):
+        assert np.array_equal(a, b, equal_nan=True)
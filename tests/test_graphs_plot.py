@@ -0,0 +1,29 @@
+import os
+import argparse
+import matplotlib.pyplot as plt
+import graph_counts
+import batch_plot
+import vowels_plot
+import consonants_plot
+from legacy import legacy_plot_bar
+from samples import synthetic_wordlist
+
+def test_batch_plots_are_byte_identical(tmp_path):
+    # the plots of two wordlists, drawn one by one with pyplot and in a pool of two workers
+    batch_plot.headless()
+    args = argparse.Namespace(alphabetical=False)
+    plots = []
+    for i in range(2):
+        vowels, consonants = map(graph_counts.merge_counts, graph_counts.count_graphs(synthetic_wordlist(60, seed=i)))
+        vowels_plot.plot_results(vowels, args, prefix=f"doc{i}_vowel_", plots=plots)
+        consonants_plot.plot_results(consonants, args, prefix=f"doc{i}_consonant_", plots=plots)
+    names = [os.path.basename(job[-1]) for job in plots]
+    assert len(set(names)) == len(plots) > 2
+
+    for job, name in zip(plots, names):
+        legacy_plot_bar(job[:-1] + (str(tmp_path / ("legacy_" + name)),))
+        plt.close("all")
+    batch_plot.render([job[:-1] + (str(tmp_path / name),) for job, name in zip(plots, names)], workers=2)
+
+    for name in names:
+        assert (tmp_path / name).read_bytes() == (tmp_path / ("legacy_" + name)).read_bytes(), name
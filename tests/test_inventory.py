@@ -0,0 +1,83 @@
+import os
+import json
+import random
+import pytest
+import inventory
+import graph_counts
+
+def longest_tokens(graphs, text):
+    # graphs of a text taken longest first from left to right, one position at a time
+    longest = max(map(len, graphs))
+    tokens = []
+    i = 0
+    while i < len(text):
+        for length in range(min(longest, len(text) - i), 0, -1):
+            if text[i:i + length] in graphs:
+                tokens.append(text[i:i + length])
+                i += length
+                break
+        else:
+            i += 1
+
+    return tokens
+
+INVENTORIES = {"default vowels": inventory.convention("default")["vowels"],
+               "default consonants": inventory.convention("default")["consonants"],
+               "bars vowels": inventory.convention("bars")["vowels"],
+               "overlapping": inventory.Inventory(["ab", "a", "bc", "abcd"])}
+
+@pytest.mark.parametrize("name", INVENTORIES)
+def test_tokens_longest_first(name):
+    # the compiled trie against the plain longest-first tokenisation, on strings of inventory characters
+    graphs = INVENTORIES[name]
+    rng = random.Random(0)
+    alphabet = sorted(set("".join(graphs))) + ["q"]
+    for i in range(2000):
+        text = "".join(rng.choice(alphabet) for j in range(rng.randint(0, 10)))
+        assert graphs.tokens(text) == longest_tokens(graphs.members, text), text
+
+def test_multi_codepoint_graphs_are_kept_whole():
+    assert graph_counts.patterns("bars")[0].findall("aœ̂e (ů)h ‖ẘ‖") == ["aœ̂e", "(ů)h", "‖ẘ‖"]
+
+def test_sequence_does_not_split_a_graph():
+    # ab is taken whole, so c is left over and no sequence of two graphs starts at a
+    graphs = inventory.Inventory(["ab", "a", "bc"])
+
+    assert graphs.sequence_pattern(2).findall("abc") == []
+    assert graphs.sequence_pattern(2).findall("abab") == ["abab"]
+    assert graphs.sequence_pattern(1, suffix="h").findall("abh bc") == ["abh", "bc"]
+
+def test_graphs_are_normalized():
+    # an e with a combining circumflex is kept as the precomposed ê the text is normalised to
+    graphs = inventory.Inventory(["e\u0302"])
+
+    assert "\u00ea" in graphs
+    assert graphs.tokens(inventory.normalize("be\u0302")) == ["\u00ea"]
+
+def write_convention(directory, name, lists):
+    with open(os.path.join(directory, name + ".json"), "w", encoding="utf-8") as f:
+        json.dump(lists, f, ensure_ascii=False)
+
+def test_bars_inherits_from_default():
+    bars, default = inventory.convention("bars"), inventory.convention("default")
+
+    assert bars.graphs("consonants") == default.graphs("consonants")
+    assert bars.graphs("parser_vowels") == default.graphs("parser_vowels")
+    assert "‖j‖" in bars["vowels"] and "|j|" not in bars["vowels"]
+
+def test_inherited_lists(tmp_path, monkeypatch):
+    monkeypatch.setattr(inventory, "INVENTORY_DIR", str(tmp_path))
+    write_convention(tmp_path, "base", {"description": "base", "vowels": ["a"], "consonants": ["b"]})
+    write_convention(tmp_path, "middle", {"inherits": "base", "vowels": ["e"]})
+    write_convention(tmp_path, "top", {"description": "top", "inherits": "middle", "consonants": ["d"]})
+
+    assert inventory.read_lists("middle") == {"description": "base", "vowels": ["e"], "consonants": ["b"]}
+    assert inventory.Convention("top").lists == {"description": "top", "vowels": ["e"], "consonants": ["d"]}
+
+def test_inheriting_from_itself(tmp_path, monkeypatch):
+    monkeypatch.setattr(inventory, "INVENTORY_DIR", str(tmp_path))
+    write_convention(tmp_path, "one", {"inherits": "two", "vowels": ["a"]})
+    write_convention(tmp_path, "two", {"inherits": "one", "vowels": ["e"]})
+
+    with pytest.raises(ValueError, match="one -> two -> one"):
+        inventory.Convention("one")
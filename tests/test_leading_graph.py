@@ -0,0 +1,58 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import leading_graph
+import graphematic
+from legacy import legacy_transform
+from samples import synthetic_box
+
+@pytest.mark.parametrize("size", [0, 1, 2, 500])
+def test_transform_data_equals_original(size):
+    df, columns = synthetic_box(size, seed=size)
+
+    assert leading_graph.transform_data(df.copy(), columns).equals(legacy_transform(df.copy(), columns))
+
+def box(percentages):
+    # a box with only its Percentage row filled in
+    columns = [f"frequency_{graph}" for graph in percentages]
+    df = pd.DataFrame([[0] * len(columns)], columns=columns)
+    df.loc["Percentage"] = list(percentages.values())
+
+    return df, columns
+
+def test_leading_graph_above_threshold():
+    assert leading_graph.leading_graph(*box({"a": 20.0, "ei": 80.0})) == ("ei", 80.0)
+
+def test_leading_graph_at_threshold():
+    # exactly half is not more than half
+    assert leading_graph.leading_graph(*box({"a": 50.0, "ei": 50.0})) == (None, 50.0)
+    assert leading_graph.leading_graph(*box({"a": 50.0, "ei": 30.0, "e": 20.0})) == (None, 50.0)
+
+def test_leading_graph_empty_box():
+    graph, percentage = leading_graph.leading_graph(*box({"a": np.nan, "ei": np.nan}))
+
+    assert graph is None and np.isnan(percentage)
+
+def test_leading_graph_keeps_a_bare_frequency_column():
+    assert leading_graph.leading_graph(*box({"": 90.0, "a": 10.0})) == ("frequency_", 90.0)
+
+def test_directory_summary(tmp_path, monkeypatch):
+    # two manuscripts, one box of the second in a subfolder
+    monkeypatch.chdir(tmp_path)
+    raw = {"A/a.xlsx": {"frequency_a": [3, 1], "frequency_ei": [1, 0]},
+           "A/b.xlsx": {"frequency_a": [1, 0], "frequency_ei": [0, 1]},
+           "B/sub/c.xlsx": {"frequency_e": [2], "frequency_ä": [np.nan]}}
+    for name, columns in raw.items():
+        os.makedirs(os.path.join("data", "5_boxes_raw", os.path.dirname(name)), exist_ok=True)
+        pd.DataFrame({"word": ["x"] * len(next(iter(columns.values()))), **columns}).to_excel(os.path.join("data", "5_boxes_raw", name), index=False)
+    monkeypatch.setattr(sys, "argv", ["leading_graph.py", "--directory", "."])
+    leading_graph.main()
+
+    summary = pd.read_excel(os.path.join("data", "6_boxes", leading_graph.SUMMARY_NAME))
+    assert summary["box"].tolist() == [os.path.join("A", "a.xlsx"), os.path.join("A", "b.xlsx"), os.path.join("B", "sub", "c.xlsx")]
+    assert summary["leading_graph"].tolist() == ["a", np.nan, "e"]
+    assert np.allclose(summary["percentage"], [87.5, 50.0, 100.0])
+    # the summary is not a box
+    assert graphematic.list_boxes(".") == summary["box"].tolist()
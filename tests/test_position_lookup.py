@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import position_lookup
+
+# clustered tables as sound_position.py makes them, the sound positions of every word in order
+FIRST = pd.DataFrame({"sound_position": ["v", "ou", "g", "ie", "r", "ou"],
+                      "word": ["voug", "voug", "voug", "hier", "hier", "bouc"],
+                      "frequency": [3, 3, 3, 2, 2, 4]})
+SECOND = pd.DataFrame({"sound_position": ["ou", "b", "ie", "v", "ou", "g"],
+                       "word": ["bouc", "bouc", "ier", "voug", "voug", "voug"],
+                       "frequency": [1, 1, 7, 5, 5, 5]})
+
+def index_of(document, table):
+    return position_lookup.make_index(np.full(len(table), document), table["sound_position"], table["word"], table["frequency"])
+
+@pytest.fixture
+def merged(tmp_path, monkeypatch):
+    # both tables saved as sound_position.py saves them, and loaded together
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("output", "clustered"))
+    position_lookup.save_index(index_of("first", FIRST), position_lookup.index_path("first.xlsx"))
+    position_lookup.save_index(index_of("second", SECOND), position_lookup.index_path("second.xlsx"))
+
+    return position_lookup.load_index(["first.xlsx", "second.xlsx"])
+
+def test_make_index():
+    index = index_of("first", FIRST)
+
+    assert index["positions"].tolist() == ["g", "ie", "ou", "r", "v"]
+    assert index["words"].tolist() == ["bouc", "hier", "voug"]
+    assert index["entry_frequencies"].tolist() == [4, 2, 3]
+    assert index["position_offsets"].tolist() == [0, 1, 2, 4, 5, 6]
+
+def test_positions_for_keeps_table_order():
+    assert position_lookup.positions_for(index_of("first", FIRST), "voug") == [("first", 3.0, ["v", "ou", "g"])]
+
+def test_positions_for_merged_keeps_table_order(merged):
+    assert position_lookup.positions_for(merged, "voug") == [("first", 3.0, ["v", "ou", "g"]), ("second", 5.0, ["v", "ou", "g"])]
+    assert position_lookup.positions_for(merged, "bouc") == [("first", 4.0, ["ou"]), ("second", 1.0, ["ou", "b"])]
+    assert position_lookup.positions_for(merged, "missing") == []
+
+def test_merged_equals_index_of_both_tables(merged):
+    both = index_of("first", FIRST), index_of("second", SECOND)
+    tables = [np.concatenate(columns) for columns in zip(*map(position_lookup.rows, both))]
+    direct = position_lookup.make_index(*tables)
+
+    for key in direct:
+        assert np.array_equal(merged[key], direct[key]), key
+
+def test_rows_round_trip():
+    documents, positions, words, frequencies = position_lookup.rows(index_of("first", FIRST))
+
+    assert set(documents) == {"first"}
+    assert sorted(zip(positions, words, frequencies)) == sorted(zip(FIRST["sound_position"], FIRST["word"], FIRST["frequency"]))
+
+def test_words_for(merged):
+    assert position_lookup.words_for(index_of("first", FIRST), "ou") == [("first", "bouc", 4.0, 1), ("first", "voug", 3.0, 1)]
+    assert position_lookup.words_for(merged, "ou") == [("first", "bouc", 4.0, 1), ("second", "bouc", 1.0, 1),
+                                                       ("first", "voug", 3.0, 1), ("second", "voug", 5.0, 1)]
+    assert position_lookup.words_for(merged, "x") == []
+
+def test_totals(merged):
+    single = position_lookup.totals(index_of("first", FIRST))
+
+    assert single.to_dict("list") == {"sound_position": ["g", "ie", "ou", "r", "v"],
+                                      "words": [1, 1, 2, 1, 1],
+                                      "occurrences": [3.0, 2.0, 7.0, 2.0, 3.0]}
+    both = position_lookup.totals(merged).set_index("sound_position")
+
+    assert both.loc["ou"].tolist() == [4, 13.0]
+    assert both.loc["ie"].tolist() == [2, 9.0]
+    assert both.loc["b"].tolist() == [1, 1.0]
+
+def test_totals_counts_a_repeated_position_once_per_word():
+    table = pd.DataFrame({"sound_position": ["a", "a"], "word": ["aba", "aba"], "frequency": [2, 2]})
+
+    assert position_lookup.totals(index_of("d", table)).to_dict("list") == {"sound_position": ["a"], "words": [1], "occurrences": [4.0]}
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sound_position
+from legacy import legacy_cluster
+from samples import synthetic_annotated
+
+def annotated(rows):
+    # an annotated sheet from (frequency, graphs, sound positions) per word
+    width = max(len(graphs) for frequency, graphs, positions in rows)
+    data = []
+    for frequency, graphs, positions in rows:
+        data.append([frequency] + graphs + [np.nan] * (width - len(graphs)))
+        data.append([np.nan] + positions + [np.nan] * (width - len(positions)))
+
+    return pd.DataFrame(data, columns=["Frequency"] + [f"Token_{i}" for i in range(width)])
+
+def test_cluster_positions():
+    df = annotated([(3, ["v", "ou", "g"], ["v", "ou", "g"]),
+                    (2, ["h", "ie", "r"], [np.nan, "ie", "r"]),
+                    # the same word again keeps its first place, with these sound positions
+                    (5, ["v", "ou", "g"], ["v", "uo", np.nan])])
+    result = sound_position.cluster_positions(df, with_graphs=True)
+
+    assert result.to_dict("list") == {"sound_position": ["uo", "ie", "r"],
+                                      "word": ["voug", "hier", "hier"],
+                                      "frequency": [5, 2, 2],
+                                      "graph": ["ou", "ie", "r"]}
+
+def test_cluster_positions_needs_annotation_rows():
+    df = annotated([(3, ["v", "ou", "g"], ["v", "ou", "g"])]).iloc[:1]
+
+    with pytest.raises(ValueError):
+        sound_position.cluster_positions(df)
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 500])
+def test_cluster_positions_matches_original(size):
+    # sort_values is not stable, so equal results also mean the rows went in in the same order
+    df = synthetic_annotated(size, seed=size)
+
+    assert legacy_cluster(df).equals(sound_position.cluster_positions(df).sort_values(by='sound_position'))
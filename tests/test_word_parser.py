@@ -0,0 +1,151 @@
+import json
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+import word_parser
+import inventory
+from legacy import legacy_parse, legacy_export
+from samples import synthetic_segmented
+
+# one character of every kind parse treats differently
+PARSE_ALPHABET = [":", "|", "!", "<", ">", "[", "]", "(", ")", "#", "*", "‖", "a", "Ü", "h", "j", "i", "w", "b"]
+
+@pytest.mark.parametrize("word, graphs", [
+    ("vrouwe", ["v", "r", "ou", "w", "e"]),
+    (":ſt:at", [":ſt:", "a", "t"]),
+    ("e(i)n", ["e", "(i)", "n"]),
+    ("‖w‖ort", ["‖w‖", "o", "r", "t"]),
+    ("g[ig]e##n", ["g", "[ig]", "e", "##", "n"]),
+    ("*got*es", ["*got*", "e", "s"]),
+    ("<de>ah", ["<de>", "ah"]),
+    ("Eier", ["Eie", "r"]),
+    # quirks of the original parser, kept as they were
+    (":ab", []),
+    ("x)y", ["x", "", "y"]),
+])
+def test_parse(word, graphs):
+    assert word_parser.parse(word) == graphs
+
+def test_parse_matches_original_on_all_short_strings():
+    for length in range(5):
+        for chars in itertools.product(PARSE_ALPHABET, repeat=length):
+            word = "".join(chars)
+            assert word_parser.parse(word) == legacy_parse(word), word
+
+def test_parse_matches_original_on_segmented_words():
+    for word in synthetic_segmented(5000):
+        assert word_parser.parse(word) == legacy_parse(word), word
+
+def parsed_wordlist(size):
+    # a segmented wordlist as main reads it, and its parsed graphs
+    words = synthetic_segmented(size, seed=size)
+    df = pd.DataFrame({"Token": words, "Frequency": range(1, size + 1)})
+
+    return df, word_parser.ParsedGraphs.from_lists([word_parser.parse(word) for word in words])
+
+@pytest.mark.parametrize("size", [1, 300])
+def test_export_rows_equals_original(size, tmp_path):
+    df, parsed = parsed_wordlist(size)
+    word_parser.export_rows(df, parsed, tmp_path / "new.xlsx")
+    legacy_export(df, parsed, tmp_path / "legacy.xlsx")
+
+    assert pd.read_excel(tmp_path / "new.xlsx").equals(pd.read_excel(tmp_path / "legacy.xlsx"))
+
+def test_parsed_graphs_round_trip(tmp_path):
+    # with a word without graphs and one with an empty graph
+    words = synthetic_segmented(300) + [":ab", "x)y"]
+    parsed = word_parser.ParsedGraphs.from_lists([word_parser.parse(word) for word in words])
+    parsed.save(tmp_path / "parsed.npz")
+    loaded = word_parser.ParsedGraphs.load(tmp_path / "parsed.npz")
+
+    assert loaded.graphs.tolist() == parsed.graphs.tolist()
+    assert np.array_equal(loaded.ids, parsed.ids) and np.array_equal(loaded.offsets, parsed.offsets)
+    assert [loaded.word(i) for i in range(len(loaded))] == [word_parser.parse(word) for word in words]
+    assert loaded.to_wide().equals(parsed.to_wide())
+
+def same_graphs(a, b):
+    return a.graphs.tolist() == b.graphs.tolist() and np.array_equal(a.ids, b.ids) and np.array_equal(a.offsets, b.offsets)
+
+@pytest.mark.parametrize("chunksize", [1, 7, 100])
+def test_parse_parallel_equals_serial(chunksize):
+    # small chunks, so the words go through the pool and the parts are joined again
+    words = synthetic_segmented(300) + [":ab", "x)y"]
+    serial = word_parser.ParsedGraphs.from_lists([word_parser.parse(word) for word in words])
+
+    assert same_graphs(word_parser.parse_parallel(words, 2, chunksize=chunksize), serial)
+
+def test_parsed_graphs_concat_empty():
+    parsed = word_parser.ParsedGraphs.concat([])
+
+    assert len(parsed) == 0 and parsed.to_wide().shape == (0, 0)
+
+def test_parse_cache_counts():
+    cache = word_parser.ParseCache()
+
+    assert cache.parse_many(["vrouwe", "e(i)n", "vrouwe", ":ab", "e(i)n"]) == [word_parser.parse(word) for word in ["vrouwe", "e(i)n", "vrouwe", ":ab", "e(i)n"]]
+    assert (cache.hits, cache.misses) == (2, 3)
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = word_parser.ParseCache(maxsize=2)
+    cache.parse_many(["a", "b", "a", "c", "b"])
+
+    # b was the least recently used when c came in
+    assert list(cache.entries) == ["c", "b"]
+    assert (cache.hits, cache.misses) == (1, 4)
+
+def test_parse_cache_pool_parses_only_missing_words(monkeypatch):
+    sent = []
+    def parse_parallel(words, workers):
+        sent.append(list(words))
+        return original(words, workers, chunksize=1)
+    original = word_parser.parse_parallel
+    monkeypatch.setattr(word_parser, "parse_parallel", parse_parallel)
+    cache = word_parser.ParseCache()
+    cache.parse_many(["vrouwe", "e(i)n"])
+    words = ["e(i)n", "vrouwe", ":ſt:at", "g[ig]e##n", ":ſt:at", "vrouwe"]
+
+    assert cache.parse_many(words, workers=2) == [word_parser.parse(word) for word in words]
+    assert sent == [[":ſt:at", "g[ig]e##n"]]
+    # every word is counted once as parsed, the rest as found in memory
+    assert (cache.hits, cache.misses) == (4, 4)
+    assert cache.report() == "8 words, 4 found in memory, 4 parsed (50.0% hit rate)"
+    assert not cache.fresh
+
+@pytest.fixture
+def conventions(tmp_path, monkeypatch):
+    # a folder of conventions of its own, and the parser set back to what it was afterwards
+    monkeypatch.setattr(inventory, "INVENTORY_DIR", str(tmp_path))
+    monkeypatch.setattr(inventory, "CONVENTIONS", {})
+    for name in ["CONVENTION", "FREE_TOKEN", "FAST_TOKEN"]:
+        monkeypatch.setattr(word_parser, name, getattr(word_parser, name))
+    def write(name, parser_vowels):
+        with open(tmp_path / (name + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"parser_vowels": parser_vowels}, f, ensure_ascii=False)
+    return write
+
+def test_bars_parses_as_default():
+    assert word_parser.parser_vowels("bars") == word_parser.parser_vowels("default")
+
+def test_use_convention(conventions):
+    # o and u are no vowels here, so ou is not a cluster
+    conventions("few", ["a", "e"])
+    word_parser.use_convention("few")
+    words = ["vrouwe", "aeh", "e(i)n", "ouae"] + synthetic_segmented(100)
+
+    assert word_parser.parse("vrouwe") == ["v", "r", "o", "u", "w", "e"]
+    assert word_parser.parse("aeh") == ["aeh"]
+    assert word_parser.parse("ouae") == ["o", "u", "ae"]
+    # the workers of the pool parse with the same convention
+    assert same_graphs(word_parser.parse_parallel(words, 2, chunksize=10),
+                       word_parser.ParsedGraphs.from_lists([word_parser.parse(word) for word in words]))
+
+def test_parser_vowels_are_single_characters(conventions):
+    # an a with a combining diaeresis is the one character ä in NFC
+    conventions("decomposed", ["a\u0308", "e"])
+    conventions("long", ["a", "œ̂", "‖j‖"])
+
+    assert word_parser.parser_vowels("decomposed") == "\u00e4e"
+    with pytest.raises(ValueError, match="œ̂, ‖j‖"):
+        word_parser.use_convention("long")
+    assert word_parser.CONVENTION == "default"
@@ -0,0 +1,106 @@
+import random
+from collections import Counter
+import pytest
+from docx import Document
+import wordlist_extract
+from legacy import legacy_ugly_regex, legacy_cleanup, legacy_wordlist
+from samples import synthetic_text, SAMPLE_WORDS
+
+def new_wordlist(raw_text):
+    regexed_text = wordlist_extract.ugly_regex(raw_text)
+
+    return wordlist_extract.sort_counts(wordlist_extract.count_tokens(regexed_text, Counter()))
+
+# one string for every rule of the original normalisation
+RULE_CASES = ["a  b", "x^abc}\n y", "<a>b<c>", "{x} y", "ab[-3]", "[4]a", "a- b", "[x]y",
+              "a.b: c;d!e", "a__b_c|d= e", "wor[13]d", "_[1]", "[-2]", "<a", "{x", "[x", ""]
+
+@pytest.mark.parametrize("text", RULE_CASES)
+def test_ugly_regex_matches_original(text):
+    assert wordlist_extract.ugly_regex(text) == legacy_ugly_regex(text)
+
+@pytest.mark.parametrize("token", ["wort.", "a,b:c;d?e!f/g>h<i", "vn- ", "frage? ", ".", ""])
+def test_cleanup_matches_original(token):
+    assert wordlist_extract.cleanup(token) == legacy_cleanup(token)
+
+def test_wordlist():
+    text = "Der kvnig gie[12]ng vn|d <de>sprach: {anm.} ſtat [fol. 2r] de_r ki__nt gê= wort. wort, e(i)n (abc def) x[-3]y - "
+
+    assert new_wordlist(text) == [("abc", 1), ("de####r", 1), ("def", 1), ("Der", 1), ("e(i)n", 1),
+                                  ("gie-ng", 1), ("gê##wort", 1), ("ki#####nt", 1), ("kvnig", 1),
+                                  ("sprach", 1), ("vn###d", 1), ("wort", 1), ("x-y", 1), ("ſtat", 1)]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_wordlist_matches_original(seed):
+    text = synthetic_text(2000, seed=seed)
+
+    assert new_wordlist(text) == legacy_wordlist(text)
+
+def test_count_tokens_adds_to_counts():
+    counts = wordlist_extract.count_tokens("wort wort, . hûs", Counter({"wort": 1}))
+
+    assert counts == Counter({"wort": 3, "hûs": 1})
+
+def write_docx(path, paragraphs):
+    doc = Document()
+    for paragraph in paragraphs:
+        doc.add_paragraph(paragraph)
+    doc.save(path)
+
+def sample_paragraphs(size, seed=0):
+    # lines of a transcription, some with a word or a span going on in the next line
+    rng = random.Random(seed)
+    breaks = [("-", ""), (" <d", "e> "), (" {an", "m.} ")]
+    paragraphs = []
+    closer = ""
+    for i in range(size):
+        opener, next_closer = rng.choice(breaks) if rng.random() < 0.1 else ("", "")
+        paragraphs.append(closer + " ".join(rng.choices(SAMPLE_WORDS, k=rng.randint(1, 8))) + opener)
+        closer = next_closer
+
+    return paragraphs
+
+def calls(monkeypatch, name):
+    # count the calls of a function of wordlist_extract
+    counter = Counter()
+    function = getattr(wordlist_extract, name)
+    def counted(*args, **kwargs):
+        counter[name] += 1
+        return function(*args, **kwargs)
+    monkeypatch.setattr(wordlist_extract, name, counted)
+
+    return counter
+
+def test_incremental_counts_after_an_edit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "doc.docx")
+    cache_file = wordlist_extract.cache_path("doc.docx")
+    paragraphs = sample_paragraphs(1000)
+    write_docx(path, paragraphs)
+
+    assert wordlist_extract.incremental_counts(path, cache_file) == wordlist_extract.doc_counts(Document(path))
+
+    # one line changed, one added and one removed
+    paragraphs[40] = "nûwe wort"
+    paragraphs.insert(120, "vn- ")
+    del paragraphs[700]
+    write_docx(path, paragraphs)
+    counted = calls(monkeypatch, "count_tokens")
+
+    assert wordlist_extract.incremental_counts(path, cache_file) == wordlist_extract.doc_counts(Document(path))
+    # only the changed line and the added one are counted again, besides the full run above
+    assert counted["count_tokens"] == 1 + 2
+
+    counted.clear()
+    assert wordlist_extract.incremental_counts(path, cache_file) == wordlist_extract.doc_counts(Document(path))
+    assert counted["count_tokens"] == 1
+
+def test_incremental_counts_open_span(tmp_path, monkeypatch):
+    # a word going on over every line keeps the segment open to the end
+    path = str(tmp_path / "doc.docx")
+    write_docx(path, ["wor-"] * 400)
+    counted = calls(monkeypatch, "regex_chunk")
+
+    assert wordlist_extract.incremental_counts(path, str(tmp_path / "cache.pickle"), chunk_size=64) == Counter({"wor" * 400: 1})
+    # the open buffer is looked at after every line until it is a chunk long, then once per chunk
+    assert counted["regex_chunk"] <= 64 // 3 + 1200 // 64 + 2